@@ -2,6 +2,7 @@ import platform
 
 SCROLL_PAUSE_TIME = 0.5
 MAX_SCROLL_ATTEMPTS = 50
+SCROLL_STALE_STEPS = 5  # Stop scrolling after this many steps surface only already-seen places
 IMPLICIT_WAIT = 2
 PAGE_LOAD_TIMEOUT = 15
 
@@ -13,4 +14,144 @@ else:
 
 # Performance settings
 MAX_PLACES_PER_CITY = None  # No limit
-EXTRACT_WAIT_TIME = 0.5
+
+# Readiness waits resolve as soon as the page is ready; these are upper bounds (seconds)
+WAIT_TIMEOUTS = {
+    'google_search': 10,
+    'google_scroll': 1.0,
+    'google_place': 10,
+    'yandex_search': 10,
+    'yandex_scroll': 3,
+    'yandex_place': 8,
+    'yandex_contacts': 1.5
+}
+
+# Parallel extraction (1 = single browser, extraction runs inline)
+WORKER_COUNT = 1
+WORKER_BACKEND = 'thread'  # 'thread' or 'process'
+
+# Feed-only harvesting: keep records parsed from search result cards and only
+# open place pages for cards missing a phone or website
+FEED_ONLY_MODE = False
+
+# Block resources we never read (set to None to load everything)
+RESOURCE_BLOCKING_PROFILE = 'text_only'
+BLOCK_PROFILES = {
+    'images': {
+        'disable_images': True,
+        'patterns': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*']
+    },
+    'text_only': {
+        'disable_images': True,
+        'patterns': [
+            '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+            '*.woff*', '*.ttf*', '*.otf*', '*fonts.gstatic.com*', '*.mp4*', '*.webm*',
+            # Google map tiles, satellite imagery, Street View and photos
+            '*google.com/maps/vt*', '*/kh/v*', '*khms*.googleapis.com*', '*streetviewpixels*',
+            '*googleusercontent.com/p/*', '*lh3.googleusercontent.com*', '*lh5.googleusercontent.com*',
+            # Yandex map tiles, traffic layer and photos
+            '*core-renderer-tiles.maps.yandex.net*', '*core-sat.maps.yandex.net*',
+            '*core-jams-rdr*.maps.yandex.net*', '*avatars.mds.yandex.net*'
+        ]
+    }
+}
+COLLECT_NETWORK_STATS = False  # Count blocked requests and transferred bytes (uses Chrome performance log)
+
+# Raw page capture: None, 'store' (store and parse live) or 'store_only'
+# (navigate and store, parse later with offline_parser.py)
+PAGE_CAPTURE_MODE = None
+PAGE_STORE_DIR = 'page_store'
+
+# Browserless HTTP backends ('selenium' or 'http'); the browser is only started as a fallback
+GOOGLE_BACKEND = 'selenium'
+GOOGLE_BASE_URL = 'https://www.google.com'
+YANDEX_BACKEND = 'selenium'
+YANDEX_BASE_URL = 'https://yandex.ru'
+YANDEX_HTTP_CONCURRENCY = 8
+HTTP_POOL_SIZE = 16
+HTTP_TIMEOUT = 15
+HTTP_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Driver lifecycle: recycle Chrome before it bloats, swapping in a pre-warmed spare
+DRIVER_MAX_PAGES = 300  # Recycle after this many page loads (None to disable)
+DRIVER_MAX_RSS_MB = 1500  # Recycle when chromedriver + Chrome exceed this (needs psutil)
+DRIVER_SPARES = 0  # Spares kept warm at all times; one is also warmed ahead of each planned recycle
+DRIVER_PREWARM_AT = 0.8  # Fraction of the page/memory limit at which the next driver starts warming
+
+# Adaptive geographic tiling for Google: search @lat,lng,zoom tiles around each city and
+# split any tile whose feed hit Google's result cap into four tiles one zoom level closer
+GEO_TILING = False
+TILE_SATURATION = 110  # A tile returning at least this many results is considered capped
+TILE_MAX_DEPTH = 3  # How many times a tile may be subdivided
+
+# Chromedriver cache, one directory per Chrome major version (works offline once filled)
+CHROMEDRIVER_CACHE_DIR = '~/.chromedriver'
+
+# Durable work queue: city x query x service units leased to any number of workers
+# (python worker.py). To split a crawl across machines, put the file on a share all
+# hosts mount and set SQLITE_JOURNAL_MODE to 'DELETE'
+WORK_QUEUE_PATH = 'work_queue.db'
+# Journal of the SQLite files (queue, visited index, search cache). WAL needs shared
+# memory, so it only works when every process using a file runs on the same host;
+# 'DELETE' (the rollback journal) works on network shares with working file locks
+SQLITE_JOURNAL_MODE = 'WAL'
+WORK_LEASE_SECONDS = 300  # A unit whose worker stops heartbeating is handed out again after this
+WORK_HEARTBEAT_SECONDS = 60
+WORK_MAX_ATTEMPTS = 3  # Units failing this many times are marked failed and skipped
+WORK_MAX_BLOCKS = 5  # Units hitting a block or CAPTCHA page this many times in a row are marked failed too
+
+# Results are appended to the output files as they arrive and synced to disk this often
+SINK_FLUSH_SECONDS = 5
+
+# Places and businesses visited by earlier runs of a dataset; "Continue from existing CSV" skips them
+VISITED_INDEX_PATH = 'visited.db'
+
+# With both services selected, run Google and Yandex side by side, each with its own browsers
+CONCURRENT_SERVICES = True
+
+# Rate control per service: pages are classified (ok / empty / blocked / captcha / crash);
+# good pages raise the in-flight limit and shorten the delay, blocks halve the limit,
+# double the delay, pause navigation and send the work unit back to the queue
+RATE_MAX_CONCURRENCY = 8  # Most navigations in flight per service and process
+RATE_MIN_DELAY = 0.0  # Seconds between navigation starts when all is well
+RATE_MAX_DELAY = 10
+RATE_DELAY_STEP = 0.1  # Delay removed per good page
+RATE_BACKOFF_SECONDS = 30  # First pause after a block, doubling with each block in a row
+RATE_MAX_BACKOFF_SECONDS = 900
+
+# City scheduler: units run in order of expected new places per second; with a budget
+# (None for no limit) the run stops there and units expected to add nothing are skipped
+SCHEDULE_BUDGET_MINUTES = None
+SCHEDULE_BUDGET_PAGES = None
+SCHEDULE_FEED_CAP = 120  # Most places one search can return
+SCHEDULE_PRIOR_RATE = 0.0002  # New places per inhabitant assumed before any yields are known
+SCHEDULE_PRIOR_WEIGHT = 100000  # How many inhabitants' worth of evidence the prior counts as
+SCHEDULE_UNIT_SECONDS = 30  # Search and scroll cost per unit assumed until measured
+SCHEDULE_PLACE_SECONDS = 4  # Cost per place visited
+SCHEDULE_NEIGHBOUR_KM = 25  # Finished cities this close discount a city's estimate by their share of repeats
+SCHEDULE_MIN_EXPECTED = 0.5  # With a budget, units expected to add fewer places are skipped
+SCHEDULE_REPLAN_EVERY = 5  # Re-score open units after this many finished units
+
+# Query novelty: share of a query's results that were new places, over the cities it ran in
+NOVELTY_MIN_UNITS = 3  # Cities a query runs in before it is judged
+NOVELTY_DEMOTE_BELOW = 0.25  # Below this the query's remaining cities move back in the queue
+NOVELTY_SKIP_BELOW = 0.05  # Below this the query is skipped for the rest of the run
+
+# Search result cache: cards of recent searches are reused instead of searching again
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_PATH = 'search_cache.db'
+SEARCH_CACHE_TTL_HOURS = 24
+SEARCH_CACHE_MAX_ENTRIES = 20000
+
+# Refresh mode: re-extract records scraped longer ago than this, or missing any of these fields
+REFRESH_MAX_AGE_DAYS = 30
+REFRESH_REQUIRED_FIELDS = ['phone', 'website']
+
+# Stage timings and counters: rewritten to a JSON file while running and served as
+# Prometheus text on localhost (None to turn either off). Off by default; the stage
+# timings are still printed at the end of a run
+METRICS_ENABLED = False
+METRICS_PATH = 'metrics.json'
+METRICS_PORT = None  # e.g. 9108
+METRICS_WRITE_SECONDS = 30
+METRICS_MAX_SAMPLES = 2000  # Durations kept per timer for the percentiles
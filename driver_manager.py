@@ -0,0 +1,188 @@
+import threading
+import time
+from metrics import metrics
+from config import DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB, DRIVER_SPARES, DRIVER_PREWARM_AT
+
+class DriverStats:
+    """Startup latencies and recycle counts across all driver managers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.startups = []
+        self.recycles = {}
+
+    def record_startup(self, seconds):
+        with self._lock:
+            self.startups.append(seconds)
+
+    def record_recycle(self, reason):
+        with self._lock:
+            self.recycles[reason] = self.recycles.get(reason, 0) + 1
+
+    def format(self):
+        with self._lock:
+            if not self.startups:
+                return "No drivers started"
+            avg = sum(self.startups) / len(self.startups)
+            recycles = ', '.join(f"{reason}: {count}" for reason, count in sorted(self.recycles.items()))
+            return (f"{len(self.startups)} drivers started (avg {avg:.1f}s, max {max(self.startups):.1f}s), "
+                    f"recycled {sum(self.recycles.values())} ({recycles or 'none'})")
+
+driver_stats = DriverStats()
+
+def driver_rss_mb(driver):
+    """Resident memory of chromedriver and every Chrome process below it"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / 1048576
+    except Exception:
+        return None
+
+class DriverManager:
+    """Owns one scraper's driver: recycles it after DRIVER_MAX_PAGES page loads or
+    when its memory crosses DRIVER_MAX_RSS_MB, swapping in a driver warmed in the background"""
+
+    def __init__(self, factory, max_pages=DRIVER_MAX_PAGES, max_rss_mb=DRIVER_MAX_RSS_MB, spares=DRIVER_SPARES):
+        self.factory = factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.spares = spares
+        self.driver = None
+        self.pages = 0
+        self._lock = threading.Lock()
+        self._ready = []
+        self._warming = []
+        self._closed = False
+        self._ensure_spares(self.spares)
+
+    def _start_driver(self):
+        started = time.perf_counter()
+        driver = self.factory()
+        driver_stats.record_startup(time.perf_counter() - started)
+        metrics.observe('driver_start_seconds', time.perf_counter() - started)
+        return driver
+
+    def _warm(self):
+        try:
+            driver = self._start_driver()
+        except Exception as e:
+            print(f"Failed to warm spare driver: {e}")
+            driver = None
+        with self._lock:
+            self._warming.remove(threading.current_thread())
+            if driver is None:
+                return
+            if self._closed:
+                _quit_quietly(driver)
+                return
+            self._ready.append(driver)
+
+    def _ensure_spares(self, count):
+        with self._lock:
+            while not self._closed and len(self._ready) + len(self._warming) < count:
+                thread = threading.Thread(target=self._warm, daemon=True)
+                self._warming.append(thread)
+                thread.start()
+
+    def _take_driver(self):
+        with self._lock:
+            driver = self._ready.pop(0) if self._ready else None
+            warming = list(self._warming)
+        if driver is None and warming:
+            # A spare is nearly ready, waiting for it beats a cold start
+            warming[0].join()
+            with self._lock:
+                driver = self._ready.pop(0) if self._ready else None
+        if driver is None:
+            driver = self._start_driver()
+        self._ensure_spares(self.spares)
+        return driver
+
+    def acquire(self):
+        if self.driver is None:
+            self.driver = self._take_driver()
+            self.pages = 0
+        return self.driver
+
+    def recycle(self, reason='manual'):
+        """Swap in a fresh driver and quit the old one in the background"""
+        old = self.driver
+        self.driver = None
+        driver_stats.record_recycle(reason)
+        if old is not None:
+            threading.Thread(target=_quit_quietly, args=(old,), daemon=True).start()
+        return self.acquire()
+
+    def page_done(self):
+        """Count a page load and recycle if the driver is due. Returns the driver to use next."""
+        if self.driver is None:
+            return None
+        self.pages += 1
+        usage = 0.0
+        reason = None
+        
+        if self.max_pages:
+            usage = self.pages / self.max_pages
+            if self.pages >= self.max_pages:
+                reason = 'pages'
+        
+        # Memory is only sampled every few pages, psutil walks the whole process tree
+        if self.max_rss_mb and reason is None and self.pages % 10 == 0:
+            rss = driver_rss_mb(self.driver)
+            if rss is not None:
+                usage = max(usage, rss / self.max_rss_mb)
+                if rss >= self.max_rss_mb:
+                    reason = 'memory'
+        
+        if reason:
+            return self.recycle(reason)
+        if usage >= DRIVER_PREWARM_AT:
+            self._ensure_spares(max(self.spares, 1))
+        return self.driver
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            spares, self._ready = self._ready, []
+            warming = list(self._warming)
+        for thread in warming:
+            thread.join()
+        for driver in spares:
+            _quit_quietly(driver)
+        if self.driver is not None:
+            _quit_quietly(self.driver)
+            self.driver = None
+
+def _quit_quietly(driver):
+    try:
+        driver.quit()
+    except:
+        pass
+
+class LazyDriverMixin:
+    """For scrapers that only need a browser as a fallback: `self.driver` starts
+    one from `self.driver_manager` on first access"""
+
+    _driver = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            print("Starting browser for fallback...")
+            self._driver = self.driver_manager.acquire()
+        return self._driver
+
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
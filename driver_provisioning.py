@@ -0,0 +1,176 @@
+import json
+import os
+import platform
+import re
+import shutil
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from config import CHROME_BINARY_PATH, CHROMEDRIVER_CACHE_DIR
+
+VERSIONS_URL = 'https://googlechromelabs.github.io/chrome-for-testing/latest-versions-per-milestone-with-downloads.json'
+VERSION_RE = re.compile(r'(\d+)\.\d+\.\d+\.\d+')
+
+IS_WINDOWS = platform.system() == 'Windows'
+DRIVER_NAME = 'chromedriver.exe' if IS_WINDOWS else 'chromedriver'
+PLATFORM_NAME = 'win64' if IS_WINDOWS else 'linux64'
+
+# Resolved once per process, every later driver spawn or recycle reuses it
+_resolved = {}
+_lock = threading.Lock()
+
+class ProvisioningStats:
+    def __init__(self):
+        self.events = []
+
+    def record(self, source, seconds):
+        self.events.append({'source': source, 'seconds': seconds})
+
+    def format(self):
+        if not self.events:
+            return "Chromedriver not resolved"
+        return ', '.join(f"{e['source']} in {e['seconds'] * 1000:.0f}ms" for e in self.events)
+
+provisioning_stats = ProvisioningStats()
+
+def cache_dir():
+    return os.path.expanduser(CHROMEDRIVER_CACHE_DIR)
+
+def find_chrome_binary():
+    if CHROME_BINARY_PATH and os.path.exists(CHROME_BINARY_PATH):
+        return CHROME_BINARY_PATH
+    if IS_WINDOWS:
+        candidates = [
+            'C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe',
+            'C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe',
+            os.path.expanduser('~\\AppData\\Local\\Google\\Chrome\\Application\\chrome.exe')
+        ]
+        return next((p for p in candidates if os.path.exists(p)), None)
+    for name in ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser']:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def chrome_major_version(binary):
+    """Chrome major version, cached on disk by binary path, size and mtime
+    so the `chrome --version` spawn only happens after an upgrade"""
+    info = os.stat(binary)
+    fingerprint = f"{binary}|{info.st_size}|{int(info.st_mtime)}"
+    versions_file = os.path.join(cache_dir(), 'chrome_versions.json')
+    known = _read_json(versions_file)
+    if fingerprint in known:
+        return known[fingerprint]
+    
+    major = None
+    if IS_WINDOWS:
+        # chrome.exe --version opens a window on Windows, the install keeps a versioned folder instead
+        for name in os.listdir(os.path.dirname(binary)):
+            match = VERSION_RE.fullmatch(name)
+            if match:
+                major = max(major or '0', match.group(1), key=int)
+    else:
+        result = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=30)
+        match = VERSION_RE.search(result.stdout)
+        if match:
+            major = match.group(1)
+    
+    if major:
+        known[fingerprint] = major
+        _write_json(versions_file, known)
+    return major
+
+def _cached_driver(major):
+    path = os.path.join(cache_dir(), major, DRIVER_NAME)
+    return path if os.path.exists(path) else None
+
+def _adopt_legacy_driver(major):
+    """Move an unversioned ~/.chromedriver/chromedriver into its version slot if it matches"""
+    legacy_path = os.path.join(cache_dir(), DRIVER_NAME)
+    if not os.path.exists(legacy_path):
+        return None
+    try:
+        result = subprocess.run([legacy_path, '--version'], capture_output=True, text=True, timeout=30)
+    except Exception:
+        return None
+    match = VERSION_RE.search(result.stdout)
+    if not match or match.group(1) != major:
+        return None
+    target = os.path.join(cache_dir(), major, DRIVER_NAME)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(legacy_path, target)
+    return target
+
+def _download_driver(major):
+    import requests
+    
+    data = requests.get(VERSIONS_URL, timeout=30).json()
+    downloads = data['milestones'][major]['downloads']['chromedriver']
+    url = next(item['url'] for item in downloads if item['platform'] == PLATFORM_NAME)
+    
+    target = os.path.join(cache_dir(), major, DRIVER_NAME)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Unpack in a private directory then rename, concurrent processes may race here
+    work_dir = tempfile.mkdtemp(dir=cache_dir())
+    try:
+        zip_path = os.path.join(work_dir, 'chromedriver.zip')
+        response = requests.get(url, stream=True, timeout=60)
+        response.raise_for_status()
+        with open(zip_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(work_dir)
+        extracted = os.path.join(work_dir, f"chromedriver-{PLATFORM_NAME}", DRIVER_NAME)
+        if not IS_WINDOWS:
+            os.chmod(extracted, stat.S_IRWXU)
+        os.replace(extracted, target)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return target
+
+def get_chromedriver():
+    """Path to a chromedriver matching the installed Chrome, or None to let Selenium decide"""
+    with _lock:
+        if 'path' in _resolved:
+            return _resolved['path']
+        
+        started = time.perf_counter()
+        source = 'cache'
+        path = None
+        try:
+            binary = find_chrome_binary()
+            major = chrome_major_version(binary) if binary else None
+            if major:
+                path = _cached_driver(major) or _adopt_legacy_driver(major)
+                if not path:
+                    source = 'download'
+                    path = _download_driver(major)
+        except Exception as e:
+            print(f"Chromedriver download failed: {e}")
+        
+        if not path:
+            # A driver for another Chrome major fails to start a session; Selenium's
+            # own lookup is the better bet than any cached driver
+            source = 'selenium'
+        
+        provisioning_stats.record(source, time.perf_counter() - started)
+        _resolved['path'] = path
+        return path
@@ -0,0 +1,302 @@
+"""Single-roundtrip field extraction shared by the Google and Yandex scrapers.
+
+Selectors are plain data: every field maps to an ordered list of CSS selectors.
+One execute_script call collects text, aria-label and href of every matching
+element, and the per-field parsers below pick the value in Python.
+"""
+
+EXTRACT_SCRIPT = """
+var fields = arguments[0];
+var result = {};
+Object.keys(fields).forEach(function(name) {
+    var candidates = [];
+    fields[name].forEach(function(selector) {
+        var elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            return;
+        }
+        for (var i = 0; i < elements.length; i++) {
+            var el = elements[i];
+            candidates.push({
+                text: (el.innerText || '').trim(),
+                label: el.getAttribute('aria-label'),
+                href: el.getAttribute('href') !== null ? el.href : null
+            });
+        }
+    });
+    result[name] = candidates;
+});
+return result;
+"""
+
+GOOGLE_FIELDS = {
+    'title': ['h1.DUwDvf'],
+    'rating': ['div.F7nice span[aria-hidden="true"]'],
+    'reviews': ['div.F7nice span[aria-label*="reviews"]'],
+    'category': ['button.DkEaL'],
+    'address': [
+        'button[data-item-id="address"]',
+        'button[data-tooltip="Copy address"]',
+        '[data-item-id="address"] div.fontBodyMedium'
+    ],
+    'website': [
+        'a[data-item-id="authority"]',
+        'a[data-tooltip="Open website"]',
+        'a[aria-label*="Website"]',
+        'a[aria-label*="İnternet sitesi"]'
+    ],
+    'phone': [
+        'button[data-item-id*="phone"]',
+        'button[data-tooltip="Copy phone number"]',
+        '[data-item-id*="phone"] div.fontBodyMedium',
+        'button[aria-label*="Phone"]',
+        'button[aria-label*="Telefon"]'
+    ]
+}
+
+YANDEX_FIELDS = {
+    'title': [
+        'h1.orgpage-header-view__header',
+        'h1[class*="title"]',
+        'div[class*="card-title-view"] h1',
+        'span[class*="card-title"]'
+    ],
+    'rating': ['span[class*="rating-badge"]', 'div[class*="rating"]'],
+    'reviews': ['span[class*="reviews"]', 'a[class*="reviews"]'],
+    'category': ['div[class*="rubric"]', 'span[class*="category"]'],
+    'address': [
+        'div[class*="business-card-address"]',
+        'a[class*="address"]',
+        'div[class*="address"] span',
+        'span[itemprop="address"]',
+        'div[class*="contacts"] div[class*="address"]'
+    ],
+    'website': ['a[href^="http"]'],
+    'phone': [
+        'a[href^="tel:"]',
+        'div[class*="business-contacts-phone"]',
+        'div[class*="phone"] span',
+        'span[class*="phone"]',
+        'div[itemprop="telephone"]'
+    ]
+}
+
+SOCIAL_DOMAINS = ['instagram', 'facebook', 'vk.com', 'twitter', 'telegram']
+PHONE_BUTTON_TEXTS = ['Telefonu göster', 'Show phone', 'Показать телефон']
+
+def extract_fields(driver, fields):
+    """Collect candidates for every field in one WebDriver round trip"""
+    return driver.execute_script(EXTRACT_SCRIPT, fields) or {}
+
+def parse_fields(candidates, parsers):
+    data = {}
+    for name, parser in parsers.items():
+        try:
+            data[name] = parser(candidates.get(name) or [])
+        except:
+            data[name] = None
+    return data
+
+def _first_text(candidates):
+    return candidates[0]['text'] if candidates else None
+
+def _google_reviews(candidates):
+    if not candidates:
+        return None
+    return candidates[0]['label'].split()[0].replace(',', '')
+
+def _google_address(candidates):
+    for item in candidates:
+        aria_label = item.get('label')
+        if aria_label:
+            if 'Address:' in aria_label:
+                return aria_label.replace('Address:', '').strip()
+            if 'Adres:' in aria_label:
+                return aria_label.replace('Adres:', '').strip()
+        text = item.get('text')
+        if text and len(text) > 10:
+            return text
+    return None
+
+def _google_website(candidates):
+    for item in candidates:
+        href = item.get('href')
+        if href and 'google.com' not in href:
+            return href
+    return None
+
+def _google_phone(candidates):
+    for item in candidates:
+        aria_label = item.get('label')
+        if aria_label:
+            if 'Phone:' in aria_label:
+                return aria_label.replace('Phone:', '').strip()
+            if 'Telefon:' in aria_label:
+                return aria_label.replace('Telefon:', '').strip()
+        text = item.get('text')
+        if text and ('+' in text or text.replace(' ', '').replace('-', '').isdigit()):
+            return text
+    return None
+
+def _yandex_title(candidates):
+    for item in candidates:
+        if item.get('text'):
+            return item['text']
+    return None
+
+def _yandex_rating(candidates):
+    for item in candidates:
+        text = item.get('text')
+        if text and any(c.isdigit() for c in text):
+            return text.split()[0]
+    return None
+
+def _yandex_reviews(candidates):
+    for item in candidates:
+        text = item.get('text')
+        if text and any(c.isdigit() for c in text):
+            return ''.join(filter(str.isdigit, text))
+    return None
+
+def _yandex_address(candidates):
+    for item in candidates:
+        text = item.get('text')
+        if text and len(text) > 10:
+            return text
+    return None
+
+def _yandex_website(candidates):
+    hrefs = [item['href'] for item in candidates if item.get('href')]
+    
+    # Prefer real websites over social media
+    for href in hrefs:
+        if 'yandex' in href.lower():
+            continue
+        if any(social in href.lower() for social in SOCIAL_DOMAINS):
+            continue
+        return href
+    
+    for href in hrefs:
+        if 'yandex' not in href.lower() and 'http' in href:
+            return href
+    return None
+
+def _yandex_phone(candidates):
+    # tel: links first
+    for item in candidates:
+        href = item.get('href') or ''
+        if href.startswith('tel:'):
+            phone = href.replace('tel:', '').strip()
+            if phone:
+                return phone
+    
+    for item in candidates:
+        text = item.get('text')
+        if text and ('+' in text or any(c.isdigit() for c in text)):
+            for button_text in PHONE_BUTTON_TEXTS:
+                text = text.replace(button_text, '')
+            text = text.strip()
+            if any(c.isdigit() for c in text):
+                return text
+    return None
+
+GOOGLE_PARSERS = {
+    'title': _first_text,
+    'rating': _first_text,
+    'reviews': _google_reviews,
+    'category': _first_text,
+    'address': _google_address,
+    'website': _google_website,
+    'phone': _google_phone
+}
+
+YANDEX_PARSERS = {
+    'title': _yandex_title,
+    'rating': _yandex_rating,
+    'reviews': _yandex_reviews,
+    'category': _first_text,
+    'address': _yandex_address,
+    'website': _yandex_website,
+    'phone': _yandex_phone
+}
+
+# Search-result cards in the Google feed already carry most place fields
+GOOGLE_CARD_SCRIPT = """
+// arguments[0]: number of anchors already read, the feed only ever appends
+var anchors = document.querySelectorAll('a[href*="/maps/place/"]');
+var cards = [];
+Array.prototype.slice.call(anchors, arguments[0] || 0).forEach(function(anchor) {
+    var card = anchor.closest('div.Nv2PK') || anchor.parentElement;
+    var text = function(selector) {
+        var el = card.querySelector(selector);
+        return el ? (el.innerText || '').trim() : null;
+    };
+    var website = card.querySelector('a[data-value="Website"], a[data-value="Web sitesi"]');
+    var lines = [];
+    card.querySelectorAll('div.W4Efsd div.W4Efsd').forEach(function(line) {
+        if (line.querySelector('div.W4Efsd')) return;
+        lines.push((line.innerText || '').trim());
+    });
+    cards.push({
+        link: anchor.href,
+        title: anchor.getAttribute('aria-label') || text('div.qBF1Pd'),
+        rating: text('span.MW4etd'),
+        reviews: text('span.UY7F9'),
+        phone: text('span.UsdlK'),
+        website: website ? website.href : null,
+        lines: lines
+    });
+});
+return {count: anchors.length, cards: cards};
+"""
+
+def parse_google_card(raw):
+    """Turn a raw feed card into a partial place record"""
+    category = None
+    address = None
+    if raw.get('lines'):
+        # First info line reads "Category · Address"
+        parts = [part.strip() for part in raw['lines'][0].split('·')]
+        parts = [part for part in parts if part]
+        if parts:
+            category = parts[0]
+        if len(parts) > 1:
+            address = parts[-1]
+    
+    reviews = raw.get('reviews')
+    if reviews:
+        reviews = ''.join(filter(str.isdigit, reviews)) or None
+    
+    return {
+        'title': raw.get('title'),
+        'rating': raw.get('rating'),
+        'reviews': reviews,
+        'category': category,
+        'address': address,
+        'website': raw.get('website'),
+        'phone': raw.get('phone'),
+        'link': raw.get('link')
+    }
+
+# Yandex search snippets carry title, rubric and address for every result
+YANDEX_SNIPPET_SCRIPT = """
+// arguments[0]: number of anchors already read, the list only ever appends
+var anchors = document.querySelectorAll('a[href*="/org/"]');
+var snippets = [];
+Array.prototype.slice.call(anchors, arguments[0] || 0).forEach(function(anchor) {
+    var card = anchor.closest('li, div[class*="search-snippet-view"]') || anchor.parentElement;
+    var text = function(selector) {
+        var el = card.querySelector(selector);
+        return el ? (el.innerText || '').trim() : null;
+    };
+    snippets.push({
+        link: anchor.href,
+        title: text('[class*="business-snippet-view__title"], [class*="snippet-view__title"]'),
+        category: text('[class*="business-snippet-view__categories"], [class*="rubric"]'),
+        address: text('[class*="business-snippet-view__address"], [class*="snippet-view__address"]')
+    });
+});
+return {count: anchors.length, cards: snippets};
+"""
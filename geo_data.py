@@ -50,6 +50,58 @@ class GeoDataManager:
         country_cities.sort(key=lambda x: x['population'], reverse=True)
         return [city['name'] for city in country_cities]
     
+    def get_country_code(self, country_name):
+        """ISO code for an exact country name, None if it is not one"""
+        for name, code in self.get_all_countries():
+            if name.lower() == country_name.lower():
+                return code
+        return None
+    
+    def get_city_names(self, country_code):
+        """Every name and alternate name (other scripts included) of a country's cities"""
+        names = set()
+        for city_data in self.gc.get_cities().values():
+            if city_data['countrycode'] != country_code:
+                continue
+            names.add(city_data['name'])
+            alternates = city_data.get('alternatenames') or []
+            if isinstance(alternates, str):
+                alternates = alternates.split(',')
+            names.update(alternates)
+        return names
+    
+    def get_city_location(self, country_code, city_name):
+        """Get coordinates and population of a city (largest match if the name repeats)"""
+        matches = [
+            city_data for city_data in self.gc.get_cities().values()
+            if city_data['countrycode'] == country_code and city_data['name'] == city_name
+        ]
+        if not matches:
+            return None
+        
+        city_data = max(matches, key=lambda x: x.get('population', 0))
+        return {
+            'latitude': float(city_data['latitude']),
+            'longitude': float(city_data['longitude']),
+            'population': city_data.get('population', 0)
+        }
+    
+    def get_city_locations(self, country_code):
+        """Coordinates and population of every city in a country, by name (largest if the name repeats)"""
+        locations = {}
+        for city_data in self.gc.get_cities().values():
+            if city_data['countrycode'] != country_code:
+                continue
+            population = city_data.get('population', 0)
+            known = locations.get(city_data['name'])
+            if known is None or population > known['population']:
+                locations[city_data['name']] = {
+                    'latitude': float(city_data['latitude']),
+                    'longitude': float(city_data['longitude']),
+                    'population': population
+                }
+        return locations
+    
     def get_cities_by_state(self, country_code, state_name, limit=50):
         """Get all cities for a US state using geonamescache"""
         if country_code != 'US':
@@ -0,0 +1,177 @@
+import json
+import re
+from urllib.parse import urlsplit
+from scraper import GoogleMapsScraper, search_url
+from http_client import create_session
+from driver_manager import DriverManager, LazyDriverMixin
+from page_store import PageStore
+from place_key import canonical_place_key
+from rate_control import rate_controller, classify_response, BLOCK_OUTCOMES, PageBlocked
+from metrics import metrics
+from config import GOOGLE_BASE_URL, HTTP_TIMEOUT, PAGE_CAPTURE_MODE
+
+STATE_MARKER = 'window.APP_INITIALIZATION_STATE='
+XSSI_PREFIX = ")]}'"
+FEATURE_ID_RE = re.compile(r'^0x[0-9a-f]+:0x[0-9a-f]+$')
+
+def extract_app_state(html):
+    """Decode the APP_INITIALIZATION_STATE array embedded in a Maps page"""
+    start = html.find(STATE_MARKER)
+    if start == -1:
+        return None
+    start += len(STATE_MARKER)
+    state, _ = json.JSONDecoder().raw_decode(html[start:])
+    return state
+
+def decode_payload(text):
+    """Preview payloads are JSON strings behind an XSSI guard"""
+    text = text.lstrip()
+    if text.startswith(XSSI_PREFIX):
+        text = text[len(XSSI_PREFIX):]
+    return json.loads(text)
+
+def _get(node, *path):
+    for index in path:
+        if not isinstance(node, list) or index >= len(node):
+            return None
+        node = node[index]
+    return node
+
+def _is_place_array(node):
+    return (
+        isinstance(node, list) and len(node) > 13
+        and isinstance(node[10], str) and FEATURE_ID_RE.match(node[10])
+        and isinstance(node[11], str)
+    )
+
+def find_place_arrays(node, depth=0):
+    """Walk a decoded payload and yield every place record array in order"""
+    if depth > 40:
+        return
+    if isinstance(node, str):
+        # Nested payloads are embedded as guarded JSON strings
+        if node.startswith(XSSI_PREFIX):
+            try:
+                node = decode_payload(node)
+            except ValueError:
+                return
+        else:
+            return
+    if not isinstance(node, list):
+        return
+    if _is_place_array(node):
+        yield node
+        return
+    for child in node:
+        yield from find_place_arrays(child, depth + 1)
+
+def parse_place_array(place, base_url=GOOGLE_BASE_URL):
+    address = _get(place, 39)
+    if not address:
+        parts = _get(place, 2)
+        if isinstance(parts, list):
+            address = ', '.join(part for part in parts if isinstance(part, str)) or None
+    
+    reviews = _get(place, 4, 8)
+    rating = _get(place, 4, 7)
+    website = _get(place, 7, 0)
+    if website and 'google.com' in website:
+        website = None
+    
+    return {
+        'title': _get(place, 11),
+        'rating': str(rating) if rating is not None else None,
+        'reviews': str(reviews) if reviews is not None else None,
+        'category': _get(place, 13, 0),
+        'address': address,
+        'website': website,
+        'phone': _get(place, 178, 0, 0),
+        'link': f"{base_url}/maps/place/data=!4m2!3m1!1s{place[10]}",
+        'place_key': f"google:{place[10].lower()}"
+    }
+
+def find_place(state, place_key):
+    """The place array for `place_key` in a place page's payload. Place pages also
+    carry nearby and "people also search for" places, so the first array is not
+    necessarily the page's own; a key without a feature ID falls back to it."""
+    first = None
+    for place in find_place_arrays(state):
+        if f"google:{place[10].lower()}" == place_key:
+            return place
+        first = first or place
+    return None if place_key and place_key.startswith('google:0x') else first
+
+class GoogleMapsHttpScraper(LazyDriverMixin, GoogleMapsScraper):
+    """Reads place data from the payloads Maps embeds in its pages, over plain HTTP.
+    A browser is started lazily, only when a response cannot be parsed."""
+
+    def __init__(self, headless=True, browser='auto', base_url=GOOGLE_BASE_URL):
+        self.base_url = base_url.rstrip('/')
+        self.session = create_session()
+        self.page_store = PageStore() if PAGE_CAPTURE_MODE else None
+        self.rate = rate_controller('Google')
+        self.http_hits = 0
+        self.fallbacks = 0
+        self.driver_manager = DriverManager(lambda: self._setup_driver(headless, browser))
+
+    def _local_url(self, url):
+        # Recorded links may point at google.com; keep requests on the configured host
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        return f"{self.base_url}{path}"
+
+    def _fetch(self, url):
+        with self.rate.slot(), metrics.timer('fetch_seconds', service='Google'):
+            response = self.session.get(url, params={'hl': 'en'}, timeout=HTTP_TIMEOUT)
+        outcome = classify_response(response.status_code, response.text, response.url)
+        self.rate.record(outcome)
+        if outcome in BLOCK_OUTCOMES:
+            raise PageBlocked(outcome, url)
+        response.raise_for_status()
+        return response.text
+
+    def _iter_search_cards(self, query, city, country, seen_places, limit, location, status):
+        url = search_url(query, city, country, location, self.base_url)
+        
+        try:
+            state = extract_app_state(self._fetch(url))
+            cards = {}
+            for place in find_place_arrays(state):
+                card = parse_place_array(place, self.base_url)
+                cards.setdefault(card['place_key'], card)
+            if cards:
+                self.http_hits += 1
+                cards = list(cards.values())
+                # Only the first ~20 results, where a scrolled feed holds ~120: never
+                # complete, so the cache keeps waiting for a full search
+                yield from (cards[:limit] if limit else cards)
+                return
+        except PageBlocked:
+            raise
+        except Exception as e:
+            print(f"HTTP search failed, using browser: {e}")
+        
+        self.fallbacks += 1
+        yield from super()._iter_search_cards(query, city, country, seen_places, limit, location, status)
+
+    def extract_place_data(self, url):
+        try:
+            state = extract_app_state(self._fetch(self._local_url(url)))
+            place = find_place(state, canonical_place_key(url))
+            if place:
+                data = parse_place_array(place, self.base_url)
+                data['link'] = url
+                data['place_key'] = canonical_place_key(url)
+                self.http_hits += 1
+                return data
+        except PageBlocked:
+            raise
+        except Exception as e:
+            print(f"HTTP extraction failed, using browser: {e}")
+        
+        self.fallbacks += 1
+        return super().extract_place_data(url)
+
+    def close(self):
+        self.session.close()
+        self.driver_manager.close()
@@ -0,0 +1,17 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import HTTP_POOL_SIZE, HTTP_USER_AGENT
+
+def create_session(pool_size=HTTP_POOL_SIZE, language='en-US,en;q=0.9'):
+    """Keep-alive session with a connection pool sized for concurrent workers"""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': HTTP_USER_AGENT,
+        'Accept-Language': language
+    })
+    return session
@@ -1,11 +1,33 @@
 import pandas as pd
 import glob
+import itertools
+import threading
+import time
 from datetime import datetime
 from colorama import Fore, Style, init
 from tqdm import tqdm
 from scraper import GoogleMapsScraper
+from google_http import GoogleMapsHttpScraper
 from yandex_scraper import YandexMapsScraper
+from yandex_http import YandexMapsHttpScraper
 from geo_data import GeoDataManager
+from worker_pool import PlaceWorkerPool
+from waits import wait_stats
+from resource_blocking import network_stats
+from driver_manager import driver_stats
+from driver_provisioning import provisioning_stats
+from place_key import canonical_place_key, business_key
+from translit import OUT_OF_TOWN
+from visited_index import VisitedIndex, keys_from_frame
+from tiling import TilePlanner
+from rate_control import PageBlocked, format_rate_stats, rate_controller
+from scheduler import CityScheduler
+from search_cache import search_cache
+from result_sink import ResultSink
+from metrics import metrics, start_metrics, save_metrics
+from refresh import with_place_keys, stale_mask, service_of, apply_update, now_stamp
+from work_queue import WorkQueue, Heartbeat, worker_name
+from config import WORKER_COUNT, WORKER_BACKEND, FEED_ONLY_MODE, COLLECT_NETWORK_STATS, GOOGLE_BACKEND, YANDEX_BACKEND, GEO_TILING, CONCURRENT_SERVICES, SCHEDULE_BUDGET_MINUTES, SCHEDULE_BUDGET_PAGES, REFRESH_MAX_AGE_DAYS, REFRESH_REQUIRED_FIELDS
 
 init(autoreset=True)
 
@@ -19,7 +41,7 @@ def select_map_service():
     print(f"{Fore.YELLOW}Select map service:{Style.RESET_ALL}")
     print(f"{Fore.GREEN}1.{Style.RESET_ALL} Google Maps (worldwide)")
     print(f"{Fore.GREEN}2.{Style.RESET_ALL} Yandex Maps (best for Russia/CIS)")
-    print(f"{Fore.GREEN}3.{Style.RESET_ALL} Both (Google first, then Yandex)")
+    print(f"{Fore.GREEN}3.{Style.RESET_ALL} Both (Google and Yandex side by side, grouped by phone)")
     
     while True:
         try:
@@ -203,6 +225,24 @@ def get_search_query():
                 return queries
         print(f"{Fore.RED}Enter at least one query{Style.RESET_ALL}")
 
+def get_time_budget():
+    """Minutes to spend on a large run, None to crawl every city"""
+    default = SCHEDULE_BUDGET_MINUTES
+    hint = f"{default}" if default else "no limit"
+    print(f"\n{Fore.YELLOW}Time budget in minutes (most promising cities go first; Enter for {hint}):{Style.RESET_ALL}")
+    
+    while True:
+        text = input(f"{Fore.CYAN}> {Style.RESET_ALL}").strip()
+        if not text:
+            return default
+        try:
+            minutes = float(text)
+            if minutes > 0:
+                return minutes
+        except ValueError:
+            pass
+        print(f"{Fore.RED}Enter a number of minutes or press Enter.{Style.RESET_ALL}")
+
 def select_output_format():
     print(f"\n{Fore.YELLOW}Output format:{Style.RESET_ALL}")
     print(f"{Fore.GREEN}1.{Style.RESET_ALL} CSV")
@@ -241,45 +281,269 @@ def group_by_phone(data):
     result.extend(no_phone)
     return result
 
-def save_data(data, format_choice, country_name, first_query):
-    if not data:
-        print(f"{Fore.RED}No data to save.{Style.RESET_ALL}")
-        return
+def needs_detail_visit(card):
+    """Feed cards missing contact details still need their place page"""
+    return not (card.get('phone') and card.get('website'))
+
+def merge_card(card, place_data):
+    """Detail-page values win, card values fill the gaps. A page that put the place
+    in another city rejects the card too."""
+    if place_data == OUT_OF_TOWN:
+        return None
+    if not place_data:
+        return dict(card) if card.get('title') else None
+    merged = dict(card)
+    for key, value in place_data.items():
+        if value is not None or key not in merged:
+            merged[key] = value
+    return merged
+
+def plan_visits(cards, seen_places, tally):
+    """Yield links that need a place-page visit; feed-complete cards are collected in tally"""
+    for card in cards:
+        tally['found'] += 1
+        link = card['link']
+        key = card.get('place_key') or canonical_place_key(link)
+        if key in seen_places:
+            continue
+        seen_places.add(key)
+        tally['new'] += 1
+        if FEED_ONLY_MODE and card.get('title') and not needs_detail_visit(card):
+            tally['complete'].append(card)
+            continue
+        tally['cards'][link] = card if FEED_ONLY_MODE else {'link': link, 'place_key': key}
+        yield link
+
+def harvest(scraper, pool, cards, service_name, city, search_query, run):
+    """Visit the new places among `cards` and add unseen businesses to the run's data"""
+    all_data = run['all_data']
+    seen_businesses = run['seen_businesses']
+    country_name = run['country_name']
+    
+    tally = {'found': 0, 'new': 0, 'added': 0, 'complete': [], 'cards': {}, 'records': []}
+    visits = plan_visits(cards, run['seen_places'], tally)
+    harvested = set()
+    try:
+        if not pool:
+            # The search browser is also the extraction browser, finish the feed first
+            visits = list(visits)
+        
+        if service_name == 'Yandex':
+            extract_kwargs = {'city': city, 'country': country_name}
+        else:
+            extract_kwargs = {}
+        
+        if pool:
+            # Workers start on the first links while the feed is still scrolling
+            extracted = pool.extract_many(visits, **extract_kwargs)
+        else:
+            extracted = ((link, scraper.extract_place_data(link, **extract_kwargs)) for link in visits)
+        results = itertools.chain(
+            ((link, merge_card(tally['cards'][link], place_data)) for link, place_data in extracted),
+            ((card['link'], dict(card)) for card in tally['complete'])
+        )
+        
+        total = None if pool else tally['new']
+        for link, place_data in tqdm(results, total=total, desc=f"{city}", leave=False, colour="blue"):
+            harvested.add(link)
+            place_key = (place_data or {}).get('place_key') or canonical_place_key(link)
+            if not place_data:
+                # Out-of-town, store-only and empty pages were visited all the same
+                if run.get('visited'):
+                    run['visited'].mark(place_key)
+                continue
+            unique_key = business_key(place_data)
+            if run.get('visited'):
+                run['visited'].mark(place_key, unique_key)
+            
+            # Services may harvest concurrently into the same run
+            with run['lock']:
+                with metrics.timer('dedupe_seconds', service=service_name):
+                    duplicate = unique_key in seen_businesses
+                if duplicate:
+                    metrics.count('duplicates', service=service_name)
+                    continue
+                place_data['city'] = city
+                place_data['country'] = country_name
+                place_data['search_query'] = search_query
+                place_data['source'] = service_name
+                place_data['scraped_at'] = now_stamp()
+                all_data.append(place_data)
+                seen_businesses.add(unique_key)
+                tally['records'].append(place_data)
+                tally['added'] += 1
+                metrics.count('records_added', service=service_name)
+                if run.get('sink'):
+                    with metrics.timer('save_seconds', service=service_name):
+                        run['sink'].write(place_data)
+    except PageBlocked:
+        # Places not visited yet become unseen again, so the requeued unit picks them up
+        for link, card in tally['cards'].items():
+            if link not in harvested:
+                run['seen_places'].discard(card.get('place_key') or canonical_place_key(link))
+        raise
+    
+    print(f"Found {tally['found']} places, {tally['new']} new")
+    if FEED_ONLY_MODE:
+        print(f"{len(tally['complete'])} complete from feed, {len(tally['cards'])} needed a page visit")
+    print(f"{Fore.GREEN}Added {tally['added']} new businesses{Style.RESET_ALL}")
+    return tally
+
+def scraper_classes():
+    """Scraper class per service, honoring the configured backends"""
+    return {
+        'Google': GoogleMapsHttpScraper if GOOGLE_BACKEND == 'http' else GoogleMapsScraper,
+        'Yandex': YandexMapsHttpScraper if YANDEX_BACKEND == 'http' else YandexMapsScraper
+    }
+
+def scrape_unit(scraper, pool, service_name, city, search_query, run, geo, country_code):
+    """Search one city for one query and harvest the results into the run.
+    Returns the combined tally: places found, new and added, and the added records."""
+    country_name = run['country_name']
+    seen_places = run['seen_places']
+    print(f"\n{Fore.CYAN}[{service_name}] Scraping: {city}, {country_name} - '{search_query}'{Style.RESET_ALL}")
+    
+    if GEO_TILING and service_name == 'Google':
+        location = geo.get_city_location(country_code, city)
+    else:
+        location = None
+    
+    if location:
+        totals = {'found': 0, 'new': 0, 'added': 0, 'records': []}
+        planner = TilePlanner(location['latitude'], location['longitude'], location['population'])
+        for tile in planner:
+            # A tile's saturation is judged by how many results its feed holds, so its
+            # scroll must not stop early on places the parent tile already returned
+            cards = scraper.iter_cards(search_query, city, country_name, seen_places=None, limit=None, location=tile)
+            tally = harvest(scraper, pool, cards, service_name, city, search_query, run)
+            planner.record(tile, tally['found'], tally['new'], tally['added'])
+            for key in totals:
+                totals[key] += tally[key]
+        print(f"{Fore.CYAN}Tiles:{Style.RESET_ALL}\n{planner.format()}")
+        return totals
+    
+    cards = scraper.iter_cards(search_query, city, country_name, seen_places=seen_places)
+    return harvest(scraper, pool, cards, service_name, city, search_query, run)
+
+def open_scraper(service_name, ScraperClass):
+    print(f"\n{Fore.CYAN}{'='*60}")
+    print(f"{Fore.CYAN}Starting {service_name} Maps scraping...")
+    print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
     
-    df = pd.DataFrame(data)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_country = country_name.replace(' ', '_')[:30]
-    safe_query = first_query.replace(' ', '_')[:30]
+    scraper = ScraperClass(headless=True)
+    pool = None
+    if WORKER_COUNT > 1:
+        pool = PlaceWorkerPool(ScraperClass, workers=WORKER_COUNT, backend=WORKER_BACKEND)
+        print(f"{Fore.CYAN}Extracting with {WORKER_COUNT} {WORKER_BACKEND} workers{Style.RESET_ALL}")
+    return scraper, pool
+
+def close_scraper(service_name, scraper, pool, total):
+    if pool:
+        pool.close()
+    scraper.close()
+    print(f"\n{Fore.GREEN}✓ {service_name} completed! Total so far: {total}{Style.RESET_ALL}")
+
+def work_through(queue, run_id, run, classes, geo, country_code, service=None, stop=None, scheduler=None):
+    """Lease units of `run_id` (only `service`'s, if given) from the queue until none
+    are left, `stop` is set or the scheduler's budget runs out. Each unit's records
+    are stored with it when it completes; an interrupted unit goes back to the queue."""
+    worker = worker_name()
+    service_name = None
+    scraper = pool = None
+    try:
+        while not (stop and stop.is_set()):
+            if scheduler and scheduler.exhausted():
+                print(f"{Fore.YELLOW}Budget spent, leaving the remaining units queued{Style.RESET_ALL}")
+                break
+            unit = queue.lease(run_id, worker, service, prefer=service_name)
+            if unit is None:
+                break
+            
+            # The lease prefers the open service's units, so each service's browsers open once
+            if unit['service'] != service_name:
+                if scraper:
+                    close_scraper(service_name, scraper, pool, len(run['all_data']))
+                    scraper = None
+                service_name = unit['service']
+                scraper, pool = open_scraper(service_name, classes[service_name])
+            
+            counts = queue.counts(run_id)
+            print(f"{Fore.CYAN}Unit {unit['id']} (attempt {unit['attempt']}), {counts.get('done', 0)}/{sum(counts.values())} done{Style.RESET_ALL}")
+            started = time.monotonic()
+            pages = rate_controller(service_name).pages()
+            try:
+                with Heartbeat(queue, unit['id'], worker) as heartbeat, metrics.timer('unit_seconds', service=service_name):
+                    tally = scrape_unit(scraper, pool, service_name, unit['city'], unit['query'], run, geo, country_code)
+            except KeyboardInterrupt:
+                queue.release(unit['id'], worker)
+                raise
+            except PageBlocked as e:
+                # The rate controller has already backed off; retry the unit later
+                if queue.block(unit['id'], worker, e.outcome):
+                    print(f"{Fore.YELLOW}Unit {unit['id']} hit a {e.outcome} page, requeued{Style.RESET_ALL}")
+                else:
+                    print(f"{Fore.RED}Unit {unit['id']} keeps hitting {e.outcome} pages, giving up on it{Style.RESET_ALL}")
+                continue
+            except Exception as e:
+                print(f"{Fore.RED}Unit {unit['id']} failed: {e}{Style.RESET_ALL}")
+                queue.fail(unit['id'], worker, e)
+                continue
+            
+            if heartbeat.lost or not queue.complete(unit['id'], worker, tally['records']):
+                print(f"{Fore.YELLOW}Lease on unit {unit['id']} was lost, another worker redoes it{Style.RESET_ALL}")
+            elif scheduler:
+                scheduler.record(unit, tally, time.monotonic() - started, rate_controller(service_name).pages() - pages)
+    finally:
+        if scraper:
+            close_scraper(service_name, scraper, pool, len(run['all_data']))
+
+def work_concurrently(queue, run_id, run, classes, geo, country_code, services, scheduler=None):
+    """One thread per service, each with its own browsers and its own units, sharing
+    the run's dedupe sets and output sink"""
+    stop = threading.Event()
+    errors = []
     
-    if format_choice in [1, 3]:
-        csv_file = f"{safe_country}_{safe_query}_{timestamp}.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        print(f"{Fore.GREEN}✓ Saved: {csv_file} ({len(data)} records){Style.RESET_ALL}")
+    def work(service_name):
+        try:
+            work_through(queue, run_id, run, classes, geo, country_code, service=service_name, stop=stop, scheduler=scheduler)
+        except Exception as e:
+            errors.append((service_name, e))
     
-    if format_choice in [2, 3]:
-        json_file = f"{safe_country}_{safe_query}_{timestamp}.json"
-        df.to_json(json_file, orient='records', indent=2, force_ascii=False)
-        print(f"{Fore.GREEN}✓ Saved: {json_file} ({len(data)} records){Style.RESET_ALL}")
+    threads = [threading.Thread(target=work, args=(name,), name=name, daemon=True) for name in services]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            # Short joins keep Ctrl-C responsive in the main thread
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        # Units still in progress are handed out again once their leases expire
+        stop.set()
+        raise
+    for service_name, e in errors:
+        print(f"{Fore.RED}{service_name} stopped: {e}{Style.RESET_ALL}")
 
 def select_mode():
     print(f"{Fore.YELLOW}Select mode:{Style.RESET_ALL}")
     print(f"{Fore.GREEN}1.{Style.RESET_ALL} Start new research")
     print(f"{Fore.GREEN}2.{Style.RESET_ALL} Continue from existing CSV")
+    print(f"{Fore.GREEN}3.{Style.RESET_ALL} Refresh stale records in an existing CSV")
     
     while True:
         try:
-            choice = int(input(f"\n{Fore.CYAN}Select (1-2): {Style.RESET_ALL}"))
-            if choice in [1, 2]:
+            choice = int(input(f"\n{Fore.CYAN}Select (1-3): {Style.RESET_ALL}"))
+            if choice in [1, 2, 3]:
                 return choice
         except ValueError:
             pass
         print(f"{Fore.RED}Invalid choice.{Style.RESET_ALL}")
 
-def load_existing_csv():
+def choose_csv():
     csv_files = glob.glob("*.csv")
     if not csv_files:
-        print(f"{Fore.RED}No CSV files found. Starting new research.{Style.RESET_ALL}")
-        return None, set(), set()
+        print(f"{Fore.RED}No CSV files found.{Style.RESET_ALL}")
+        return None
     
     print(f"\n{Fore.YELLOW}Available CSV files:{Style.RESET_ALL}")
     for idx, file in enumerate(csv_files, 1):
@@ -289,40 +553,106 @@ def load_existing_csv():
         try:
             choice = int(input(f"\n{Fore.CYAN}Select file (1-{len(csv_files)}): {Style.RESET_ALL}"))
             if 1 <= choice <= len(csv_files):
-                selected_file = csv_files[choice - 1]
-                df = pd.read_csv(selected_file)
-                
-                # Extract seen businesses and links
-                seen_businesses = set()
-                seen_links = set()
-                
-                for _, row in df.iterrows():
-                    unique_key = f"{row.get('title', '')}|{row.get('phone', '')}|{row.get('address', '')}"
-                    seen_businesses.add(unique_key)
-                    if pd.notna(row.get('link')):
-                        seen_links.add(row.get('link'))
-                
-                print(f"\n{Fore.GREEN}✓ Loaded {len(df)} existing records{Style.RESET_ALL}")
-                print(f"{Fore.CYAN}New results will be added to this dataset{Style.RESET_ALL}")
-                
-                return df.to_dict('records'), seen_businesses, seen_links
+                return csv_files[choice - 1]
         except ValueError:
             pass
         print(f"{Fore.RED}Invalid choice.{Style.RESET_ALL}")
 
+def load_existing_csv():
+    selected_file = choose_csv()
+    if not selected_file:
+        print(f"{Fore.RED}Starting new research.{Style.RESET_ALL}")
+        return None, set(), set(), None
+    
+    df = pd.read_csv(selected_file, dtype=str)
+    
+    # Extract seen businesses and places
+    seen_places, seen_businesses = keys_from_frame(df)
+    
+    print(f"\n{Fore.GREEN}✓ Loaded {len(df)} existing records{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}New results will be added to this dataset{Style.RESET_ALL}")
+    
+    return df.to_dict('records'), seen_businesses, seen_places, selected_file
+
+def refresh_existing_csv():
+    """Re-extract only the stale records of an existing dataset and log what changed"""
+    selected_file = choose_csv()
+    if not selected_file:
+        return
+    
+    df = with_place_keys(pd.read_csv(selected_file, dtype=str))
+    stale = stale_mask(df)
+    records = df.to_dict('records')
+    stale_records = [record for record, is_stale in zip(records, stale) if is_stale]
+    print(f"\n{Fore.GREEN}✓ Loaded {len(records)} places, {len(stale_records)} stale "
+          f"(older than {REFRESH_MAX_AGE_DAYS} days or missing {', '.join(REFRESH_REQUIRED_FIELDS)}){Style.RESET_ALL}")
+    if not stale_records:
+        return
+    output_format = select_output_format()
+    
+    classes = scraper_classes()
+    changes = []
+    refreshed = 0
+    try:
+        for service_name in ('Google', 'Yandex'):
+            targets = {record['link']: record for record in stale_records if service_of(record) == service_name}
+            if not targets:
+                continue
+            scraper, pool = open_scraper(service_name, classes[service_name])
+            try:
+                if pool:
+                    extracted = pool.extract_many(targets)
+                else:
+                    extracted = ((link, scraper.extract_place_data(link)) for link in targets)
+                for link, place_data in tqdm(extracted, total=len(targets), desc=f"{service_name} refresh", colour="blue"):
+                    if not place_data or place_data == OUT_OF_TOWN:
+                        continue
+                    record = targets[link]
+                    for field, old, new in apply_update(record, place_data, now_stamp()):
+                        changes.append({'place_key': record['place_key'], 'title': record.get('title'),
+                                        'field': field, 'old': old, 'new': new})
+                    refreshed += 1
+            except PageBlocked as e:
+                # Whatever was not reached stays stale and is picked up by the next refresh
+                print(f"{Fore.YELLOW}{service_name} refresh stopped at a {e.outcome} page{Style.RESET_ALL}")
+            finally:
+                close_scraper(service_name, scraper, pool, refreshed)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}Interrupted. Saving what was refreshed...{Style.RESET_ALL}")
+    
+    stem = selected_file.rsplit('.', 1)[0]
+    sink = ResultSink(output_format, 'refreshed', stem)
+    for record in records:
+        sink.write(record)
+    sink.finalize()
+    
+    changed_places = len({change['place_key'] for change in changes})
+    print(f"{Fore.GREEN}Refreshed {refreshed} of {len(stale_records)} stale places, {changed_places} changed{Style.RESET_ALL}")
+    if changes:
+        changes_file = f"{stem}_changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        pd.DataFrame(changes).to_csv(changes_file, index=False, encoding='utf-8-sig')
+        by_field = pd.Series([change['field'] for change in changes]).value_counts()
+        print(f"{Fore.CYAN}Changes per field: {', '.join(f'{field} {count}' for field, count in by_field.items())}{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}✓ Saved: {changes_file} ({len(changes)} changes){Style.RESET_ALL}")
+
 def main():
     print_banner()
     
     mode = select_mode()
     
+    if mode == 3:
+        refresh_existing_csv()
+        return
+    
     if mode == 2:
-        existing_data, existing_businesses, existing_links = load_existing_csv()
+        existing_data, existing_businesses, existing_places, existing_file = load_existing_csv()
         if existing_data is None:
             mode = 1
     else:
+        existing_file = None
         existing_data = []
         existing_businesses = set()
-        existing_links = set()
+        existing_places = set()
     
     map_service = select_map_service()
     
@@ -336,6 +666,7 @@ def main():
         return
     
     search_queries = get_search_query()
+    budget_minutes = get_time_budget() if len(cities) > 100 else SCHEDULE_BUDGET_MINUTES
     output_format = select_output_format()
     
     print(f"\n{Fore.YELLOW}Configuration:{Style.RESET_ALL}")
@@ -345,89 +676,103 @@ def main():
     print(f"\n{Fore.YELLOW}Cities to scrape:{Style.RESET_ALL} {', '.join(cities[:5])}{'...' if len(cities) > 5 else ''}")
     
     input(f"\n{Fore.GREEN}Press Enter to start...{Style.RESET_ALL}")
+    start_metrics()
     
     all_data = existing_data if mode == 2 else []
     seen_businesses = existing_businesses if mode == 2 else set()
-    seen_links = set()  # Always track links to skip duplicates across queries
+    seen_places = existing_places if mode == 2 else set()  # Canonical place keys, checked before any navigation
+    
+    sink = ResultSink(output_format, country_name, search_queries[0])
     
-    # Determine which scrapers to use
-    scrapers_to_use = []
-    if map_service == 1:
-        scrapers_to_use = [('Google', GoogleMapsScraper)]
-    elif map_service == 2:
-        scrapers_to_use = [('Yandex', YandexMapsScraper)]
-    else:  # Both
-        scrapers_to_use = [('Google', GoogleMapsScraper), ('Yandex', YandexMapsScraper)]
+    # Every visit is recorded; a continued run also skips what earlier runs of the
+    # same dataset visited (not what unrelated runs did)
+    visited = VisitedIndex()
+    visited.open_dataset(sink.base, continued_from=existing_file if mode == 2 else None)
+    if mode == 2:
+        visited.add_many(seen_places, seen_businesses)
+        known_places, known_businesses = visited.load()
+        seen_places |= known_places
+        seen_businesses |= known_businesses
+        print(f"{Fore.CYAN}Skipping {len(seen_places)} known places{Style.RESET_ALL}")
+    
+    run = {
+        'all_data': all_data,
+        'seen_businesses': seen_businesses,
+        'seen_places': seen_places,
+        'country_name': country_name,
+        'output_format': output_format,
+        'first_query': search_queries[0],
+        'sink': sink,
+        'visited': visited,
+        'lock': threading.Lock()
+    }
+    for record in all_data:
+        run['sink'].write(record)
+    
+    classes = scraper_classes()
+    services = {1: ['Google'], 2: ['Yandex'], 3: ['Google', 'Yandex']}[map_service]
+    queue = WorkQueue()
+    run_id = queue.create_run(
+        {'country_name': country_name, 'country_code': country_code, 'output_format': output_format,
+         'search_queries': search_queries, 'map_service': map_service,
+         'skip_low_yield': bool(budget_minutes or SCHEDULE_BUDGET_PAGES)},
+        [(service, city, query) for service in services for city in cities for query in search_queries]
+    )
+    print(f"{Fore.CYAN}Run {run_id} queued. More workers can join with: python worker.py --run {run_id}{Style.RESET_ALL}")
+    
+    scheduler = CityScheduler(
+        queue, run_id, country_code, geo.get_city_locations(country_code),
+        budget_seconds=budget_minutes * 60 if budget_minutes else None,
+        budget_pages=SCHEDULE_BUDGET_PAGES
+    )
+    scheduler.plan()
     
     try:
-        for service_name, ScraperClass in scrapers_to_use:
-            print(f"\n{Fore.CYAN}{'='*60}")
-            print(f"{Fore.CYAN}Starting {service_name} Maps scraping...")
-            print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
-            
-            scraper = ScraperClass(headless=True)
-            
-            try:
-                for city in tqdm(cities, desc=f"{service_name} Cities", colour="green"):
-                    for search_query in search_queries:
-                        print(f"\n{Fore.CYAN}[{service_name}] Scraping: {city}, {country_name} - '{search_query}'{Style.RESET_ALL}")
-                        
-                        place_links = scraper.search_places(search_query, city, country_name)
-                        if seen_links is not None:
-                            new_links = [link for link in place_links if link not in seen_links]
-                        else:
-                            new_links = place_links
-                        print(f"Found {len(place_links)} places, {len(new_links)} new")
-                        
-                        new_count = 0
-                        for link in tqdm(new_links, desc=f"{city}", leave=False, colour="blue"):
-                            if seen_links is not None:
-                                seen_links.add(link)
-                            
-                            if service_name == 'Yandex':
-                                place_data = scraper.extract_place_data(link, city=city, country=country_name)
-                            else:
-                                place_data = scraper.extract_place_data(link)
-                            
-                            if place_data:
-                                unique_key = f"{place_data.get('title', '')}|{place_data.get('phone', '')}|{place_data.get('address', '')}"
-                                
-                                if unique_key not in seen_businesses:
-                                    place_data['city'] = city
-                                    place_data['country'] = country_name
-                                    place_data['search_query'] = search_query
-                                    place_data['source'] = service_name
-                                    all_data.append(place_data)
-                                    seen_businesses.add(unique_key)
-                                    new_count += 1
-                                
-                                if len(all_data) % 50 == 0:
-                                    save_data(all_data, output_format, country_name, search_queries[0])
-                                    print(f"\n{Fore.YELLOW}Auto-saved {len(all_data)} records{Style.RESET_ALL}")
-                        
-                        print(f"{Fore.GREEN}Added {new_count} new businesses{Style.RESET_ALL}")
-            finally:
-                scraper.close()
-                print(f"\n{Fore.GREEN}✓ {service_name} completed! Total so far: {len(all_data)}{Style.RESET_ALL}")
+        if len(services) > 1 and CONCURRENT_SERVICES:
+            work_concurrently(queue, run_id, run, classes, geo, country_code, services, scheduler)
+        else:
+            work_through(queue, run_id, run, classes, geo, country_code, scheduler=scheduler)
+        
+        # Places other workers collected for this run
+        for record in queue.results(run_id):
+            unique_key = business_key(record)
+            if unique_key not in seen_businesses:
+                seen_businesses.add(unique_key)
+                all_data.append(record)
+                run['sink'].write(record)
         
         print(f"\n{Fore.GREEN}✓ All scraping completed!{Style.RESET_ALL}")
         print(f"Total places: {Fore.CYAN}{len(all_data)}{Style.RESET_ALL}")
+        if wait_stats.stages:
+            print(f"\n{Fore.YELLOW}Page readiness waits:{Style.RESET_ALL}\n{wait_stats.format()}")
+        print(f"{Fore.YELLOW}Drivers:{Style.RESET_ALL} {driver_stats.format()}; chromedriver {provisioning_stats.format()}")
+        print(f"{Fore.YELLOW}Rate control:{Style.RESET_ALL}\n{format_rate_stats()}")
+        if search_cache():
+            print(f"{Fore.YELLOW}Search cache:{Style.RESET_ALL} {search_cache().format()}")
+        print(f"{Fore.YELLOW}Schedule:{Style.RESET_ALL} {scheduler.format()}")
+        print(f"{Fore.YELLOW}Query novelty:{Style.RESET_ALL}\n{scheduler.novelty.format(scheduler.seconds_per_unit())}")
+        if COLLECT_NETWORK_STATS:
+            print(f"{Fore.YELLOW}Network:{Style.RESET_ALL} {network_stats.format()}")
+        print(f"{Fore.YELLOW}Stage timings:{Style.RESET_ALL}\n{metrics.format()}")
         
         # If Both option, group by phone number
-        if map_service == 3:
-            all_data = group_by_phone(all_data)
-            print(f"{Fore.YELLOW}Grouped by phone number{Style.RESET_ALL}")
-        
-        save_data(all_data, output_format, country_name, search_queries[0])
+        with metrics.timer('finalize_seconds'):
+            if map_service == 3:
+                print(f"{Fore.YELLOW}Grouping by phone number{Style.RESET_ALL}")
+                run['sink'].finalize(regroup=group_by_phone)
+            else:
+                run['sink'].finalize()
         
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}Interrupted. Saving collected data...{Style.RESET_ALL}")
-        if all_data:
-            save_data(all_data, output_format, country_name, search_queries[0])
+        print(f"{Fore.CYAN}Resume with: python worker.py --run {run_id} --export{Style.RESET_ALL}")
+        run['sink'].finalize()
     except Exception as e:
         print(f"\n{Fore.RED}Error: {e}{Style.RESET_ALL}")
-        if all_data:
-            save_data(all_data, output_format, country_name, search_queries[0])
+        run['sink'].finalize()
+    finally:
+        visited.close()
+        save_metrics()
 
 if __name__ == "__main__":
     main()
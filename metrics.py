@@ -0,0 +1,197 @@
+import functools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_ENABLED, METRICS_PATH, METRICS_PORT, METRICS_WRITE_SECONDS, METRICS_MAX_SAMPLES
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Metrics:
+    """Stage timers and event counters, each keyed by a name and a few labels
+    (service, stage, field). Timers keep count, sum and max exactly and a
+    reservoir of `max_samples` durations for the percentiles."""
+
+    def __init__(self, max_samples=METRICS_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.started = time.time()
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self.timers.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0, 'samples': []})
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            if len(entry['samples']) < self.max_samples:
+                entry['samples'].append(seconds)
+            else:
+                slot = random.randrange(entry['count'])
+                if slot < self.max_samples:
+                    entry['samples'][slot] = seconds
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the block; a block left by an exception is counted under `<name>_errors`"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        with self._lock:
+            uptime = time.time() - self.started
+            timers = []
+            for (name, labels), entry in sorted(self.timers.items()):
+                ordered = sorted(entry['samples'])
+                timers.append({
+                    'name': name, 'labels': dict(labels), 'count': entry['count'],
+                    'sum': entry['sum'], 'max': entry['max'],
+                    **{f"p{int(q * 100)}": _quantile(ordered, q) for q in QUANTILES}
+                })
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value, 'per_minute': value / uptime * 60 if uptime else 0}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {'started': self.started, 'uptime_seconds': uptime, 'timers': timers, 'counters': counters}
+
+    def write_json(self, path=METRICS_PATH):
+        # Written aside and renamed, so a reader never sees half a file; each write
+        # has its own temp file, as the periodic writer and save_metrics may overlap
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, prefix=os.path.basename(path),
+                                         suffix='.tmp', delete=False) as f:
+            json.dump(self.summary(), f, indent=2)
+        try:
+            os.replace(f.name, path)
+        except OSError:
+            os.remove(f.name)
+            raise
+
+    def prometheus_text(self):
+        summary = self.summary()
+        lines = [f"scraper_uptime_seconds {summary['uptime_seconds']:.3f}"]
+        typed = set()
+        for timer in summary['timers']:
+            name = f"scraper_{timer['name']}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            for q in QUANTILES:
+                labels = _labels({**timer['labels'], 'quantile': str(q)})
+                lines.append(f"{name}{labels} {timer[f'p{int(q * 100)}']:.6f}")
+            labels = _labels(timer['labels'])
+            lines.append(f"{name}_sum{labels} {timer['sum']:.6f}")
+            lines.append(f"{name}_count{labels} {timer['count']}")
+        for counter in summary['counters']:
+            name = f"scraper_{counter['name']}_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(counter['labels'])} {counter['value']}")
+        return '\n'.join(lines) + '\n'
+
+    def format(self):
+        """Slowest stages first, then counters"""
+        summary = self.summary()
+        lines = []
+        for timer in sorted(summary['timers'], key=lambda timer: -timer['sum']):
+            labels = ''.join(f" {key}={value}" for key, value in timer['labels'].items())
+            lines.append(f"  {timer['name']}{labels}: {timer['count']} x, p50 {timer['p50']:.2f}s, "
+                         f"p95 {timer['p95']:.2f}s, p99 {timer['p99']:.2f}s, total {timer['sum'] / 60:.1f} min")
+        for counter in summary['counters']:
+            labels = ''.join(f" {key}={value}" for key, value in counter['labels'].items())
+            lines.append(f"  {counter['name']}{labels}: {counter['value']} ({counter['per_minute']:.1f}/min)")
+        return '\n'.join(lines) or "  Nothing measured"
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+metrics = Metrics()
+
+def count_missing_fields(service, data):
+    """Count each field a place page yielded no value for, so a selector that stopped
+    matching shows up as a climbing counter"""
+    for field, value in data.items():
+        if value is None:
+            metrics.count('field_missing', service=service, field=field)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            metrics.write_json(path)
+        except OSError as e:
+            print(f"Could not write {path}: {e}")
+
+_started = False
+
+def start_metrics(port=METRICS_PORT, path=METRICS_PATH, interval=METRICS_WRITE_SECONDS):
+    """Serve Prometheus text on localhost:`port` and rewrite the JSON stats file every
+    `interval` seconds, both from daemon threads. Does nothing when metrics are off."""
+    global _started
+    if not METRICS_ENABLED or _started:
+        return
+    _started = True
+    if port:
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+        except OSError as e:
+            # Another process on this machine (a second worker) already has the port
+            print(f"Metrics endpoint not started on port {port}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(f"Metrics at http://127.0.0.1:{port}/metrics")
+    if path and interval:
+        threading.Thread(target=_write_periodically, args=(path, interval), daemon=True).start()
+
+def save_metrics(path=METRICS_PATH):
+    if METRICS_ENABLED and path:
+        metrics.write_json(path)
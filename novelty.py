@@ -0,0 +1,67 @@
+import threading
+from config import NOVELTY_MIN_UNITS, NOVELTY_DEMOTE_BELOW, NOVELTY_SKIP_BELOW
+
+class QueryNovelty:
+    """Share of each query's results that were new places, accumulated over the cities
+    it has run in. Overlapping queries ("diesel repair shop", "diesel mechanic") soon
+    return mostly places another query already found; those are demoted, and skipped
+    for the rest of the run once almost nothing they return is new."""
+
+    def __init__(self, min_units=NOVELTY_MIN_UNITS, demote_below=NOVELTY_DEMOTE_BELOW, skip_below=NOVELTY_SKIP_BELOW):
+        self.min_units = min_units
+        self.demote_below = demote_below
+        self.skip_below = skip_below
+        self.stats = {}
+        self.skipped_units = {}
+        self._lock = threading.Lock()
+
+    def record(self, service, query, found, new):
+        """Add one finished unit. Returns True when this tips the query into being skipped"""
+        with self._lock:
+            before = self._factor((service, query))
+            stats = self.stats.setdefault((service, query), {'units': 0, 'found': 0, 'new': 0})
+            stats['units'] += 1
+            stats['found'] += found
+            stats['new'] += new
+            return before > 0 and self._factor((service, query)) == 0
+
+    def novelty(self, service, query):
+        with self._lock:
+            stats = self.stats.get((service, query))
+        if not stats or not stats['found']:
+            return None
+        return stats['new'] / stats['found']
+
+    def _factor(self, key):
+        stats = self.stats.get(key)
+        if not stats or stats['units'] < self.min_units or not stats['found']:
+            return 1.0
+        novelty = stats['new'] / stats['found']
+        if novelty < self.skip_below:
+            return 0.0
+        if novelty < self.demote_below:
+            return novelty / self.demote_below
+        return 1.0
+
+    def factor(self, service, query):
+        """Priority multiplier for a query's remaining units: 1 as usual, 0 to skip"""
+        with self._lock:
+            return self._factor((service, query))
+
+    def note_skipped(self, service, query, units):
+        with self._lock:
+            self.skipped_units[(service, query)] = units
+
+    def format(self, seconds_per_unit=None):
+        with self._lock:
+            lines = []
+            for (service, query), stats in sorted(self.stats.items()):
+                novelty = stats['new'] / stats['found'] if stats['found'] else 0
+                line = f"  [{service}] '{query}': {stats['new']}/{stats['found']} new ({novelty:.0%}) over {stats['units']} cities"
+                skipped = self.skipped_units.get((service, query))
+                if skipped:
+                    line += f", {skipped} cities skipped"
+                    if seconds_per_unit:
+                        line += f" (~{skipped * seconds_per_unit / 60:.0f} min saved)"
+                lines.append(line)
+            return '\n'.join(lines) or "  No queries finished"
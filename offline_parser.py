@@ -0,0 +1,85 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin
+from page_store import PageStore
+from translit import city_matches
+from extraction import GOOGLE_FIELDS, GOOGLE_PARSERS, YANDEX_FIELDS, YANDEX_PARSERS, parse_fields
+from config import PAGE_STORE_DIR
+
+FIELDS_BY_SOURCE = {
+    'Google': (GOOGLE_FIELDS, GOOGLE_PARSERS),
+    'Yandex': (YANDEX_FIELDS, YANDEX_PARSERS)
+}
+
+def collect_candidates(tree, fields, base_url):
+    """Same candidate shape as extraction.EXTRACT_SCRIPT, built from static HTML"""
+    candidates = {}
+    for name, selectors in fields.items():
+        items = []
+        for selector in selectors:
+            try:
+                elements = tree.cssselect(selector)
+            except Exception:
+                continue
+            for el in elements:
+                href = el.get('href')
+                items.append({
+                    'text': el.text_content().strip(),
+                    'label': el.get('aria-label'),
+                    'href': urljoin(base_url, href) if href is not None else None
+                })
+        candidates[name] = items
+    return candidates
+
+def parse_document(document):
+    from lxml import html as lxml_html
+    
+    meta = document.get('meta') or {}
+    source = meta.get('source', 'Google')
+    fields, parsers = FIELDS_BY_SOURCE[source]
+    tree = lxml_html.fromstring(document['html'])
+    data = parse_fields(collect_candidates(tree, fields, document['url']), parsers)
+    
+    # Yandex results outside the searched city are dropped, as in live extraction
+    city = meta.get('city')
+    if source == 'Yandex' and city and data.get('address') and not city_matches(city, data['address']):
+        return None
+    
+    data['link'] = document['url']
+    data['place_key'] = document['key']
+    for key in ('city', 'country', 'search_query'):
+        if meta.get(key):
+            data[key] = meta[key]
+    data['source'] = source
+    return data
+
+def parse_path(path):
+    try:
+        return parse_document(PageStore.load(path))
+    except Exception as e:
+        print(f"Failed to parse {path}: {e}")
+        return None
+
+def parse_store(root=PAGE_STORE_DIR, workers=None):
+    """Parse every stored page across all cores"""
+    paths = list(PageStore(root).iter_paths())
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(parse_path, paths, chunksize=64)
+        return [record for record in results if record]
+
+if __name__ == "__main__":
+    import pandas as pd
+    
+    root = sys.argv[1] if len(sys.argv) > 1 else PAGE_STORE_DIR
+    records = parse_store(root)
+    if not records:
+        print(f"No pages parsed from {root}")
+        sys.exit(1)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = sys.argv[2] if len(sys.argv) > 2 else f"offline_{timestamp}.csv"
+    pd.DataFrame(records).to_csv(output, index=False, encoding='utf-8-sig')
+    print(f"✓ Parsed {len(records)} pages into {output}")
@@ -0,0 +1,52 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from config import PAGE_STORE_DIR
+
+class PageStore:
+    """Compressed rendered pages on disk, addressed by place key"""
+
+    def __init__(self, root=PAGE_STORE_DIR):
+        self.root = root
+
+    def path_for(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.json.gz")
+
+    def put(self, key, url, html, **meta):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        document = {'key': key, 'url': url, 'captured_at': time.time(), 'meta': meta, 'html': html}
+        # Write then rename so readers never see a partial page
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def get(self, key):
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        return self.load(path)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path_for(key))
+
+    @staticmethod
+    def load(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_paths(self):
+        if not os.path.isdir(self.root):
+            return
+        for shard in sorted(os.listdir(self.root)):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in sorted(os.listdir(shard_dir)):
+                if name.endswith('.json.gz'):
+                    yield os.path.join(shard_dir, name)
@@ -0,0 +1,43 @@
+import re
+from urllib.parse import unquote, urlsplit
+
+# Google feature ID ("0x...:0x...") appears in the /data= tail and ftid params
+FEATURE_ID_RE = re.compile(r'(0x[0-9a-f]+:0x[0-9a-f]+)', re.IGNORECASE)
+# Google place ID, used when a URL carries no feature ID
+PLACE_ID_RE = re.compile(r'(ChIJ[0-9A-Za-z_-]{10,})')
+YANDEX_ORG_RE = re.compile(r'/org/(?:[^/]+/)?(\d+)')
+
+def canonical_place_key(url):
+    """Stable identity for a place URL, independent of authuser, hl, rclk and
+    the rest of the /data= tail"""
+    if not url:
+        return None
+    url = unquote(url)
+    parts = urlsplit(url)
+    
+    if 'yandex' in parts.netloc or '/org/' in parts.path:
+        match = YANDEX_ORG_RE.search(parts.path)
+        if match:
+            return f"yandex:{match.group(1)}"
+    
+    match = FEATURE_ID_RE.search(url)
+    if match:
+        return f"google:{match.group(1).lower()}"
+    match = PLACE_ID_RE.search(url)
+    if match:
+        return f"google:{match.group(1)}"
+    
+    # Unknown shape: drop query string and fragment
+    return f"url:{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+BUSINESS_KEY_FIELDS = ('title', 'phone', 'address')
+
+def _key_part(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value).strip()
+
+def business_key(record):
+    """Dedupe key for a business: title, phone and address, with missing values
+    (None, or NaN in rows read back from CSV) all counted as empty"""
+    return '|'.join(_key_part(record.get(field)) for field in BUSINESS_KEY_FIELDS)
@@ -0,0 +1,184 @@
+import html
+import re
+import threading
+import time
+from contextlib import contextmanager
+from metrics import metrics
+from config import RATE_MAX_CONCURRENCY, RATE_MIN_DELAY, RATE_MAX_DELAY, RATE_DELAY_STEP, RATE_BACKOFF_SECONDS, RATE_MAX_BACKOFF_SECONDS
+
+OUTCOMES = ('ok', 'empty', 'blocked', 'captcha', 'crash')
+# Outcomes that mean the site is pushing back: slow down, rotate the browser, retry later
+BLOCK_OUTCOMES = ('blocked', 'captcha')
+
+CAPTCHA_URL_MARKERS = ['/sorry/', 'showcaptcha', 'captcha']
+CAPTCHA_TEXT_MARKERS = ['unusual traffic', 'not a robot', 'не робот', 'smartcaptcha', 'запросы отправляли вы, а не робот']
+BLOCK_URL_MARKERS = ['consent.google.', 'consent.yandex.']
+BLOCK_TEXT_MARKERS = ['before you continue to google', 'too many requests', 'access denied', 'доступ ограничен']
+
+CLASSIFY_SCRIPT = """
+var body = document.body;
+return {
+    url: location.href,
+    text: body ? (body.innerText || '').slice(0, 3000) : '',
+    captcha: !!document.querySelector('iframe[src*="recaptcha"], form#captcha-form, .CheckboxCaptcha, .SmartCaptcha, .AdvancedCaptcha'),
+    ready: !!document.querySelector(arguments[0])
+};
+"""
+
+class PageBlocked(Exception):
+    """The site answered with a block or CAPTCHA page instead of content"""
+
+    def __init__(self, outcome, url=None):
+        super().__init__(outcome, url)
+        self.outcome = outcome
+        self.url = url
+
+    def __str__(self):
+        return f"{self.outcome} page at {self.url}" if self.url else f"{self.outcome} page"
+
+def _classify(url, text, captcha_widget=False):
+    url = (url or '').lower()
+    text = (text or '').lower()
+    if captcha_widget or any(marker in url for marker in CAPTCHA_URL_MARKERS) or any(marker in text for marker in CAPTCHA_TEXT_MARKERS):
+        return 'captcha'
+    if any(marker in url for marker in BLOCK_URL_MARKERS) or any(marker in text for marker in BLOCK_TEXT_MARKERS):
+        return 'blocked'
+    return None
+
+def classify_page(driver, ready_selector):
+    """ok / empty / blocked / captcha / crash for the page the driver is on.
+    `ready_selector` matches an element every good page of this kind has."""
+    try:
+        page = driver.execute_script(CLASSIFY_SCRIPT, ready_selector) or {}
+    except Exception:
+        return 'crash'
+    outcome = _classify(page.get('url'), page.get('text'), page.get('captcha'))
+    if outcome:
+        return outcome
+    return 'ok' if page.get('ready') else 'empty'
+
+HIDDEN_RE = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>', re.S | re.I)
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.S | re.I)
+TAG_RE = re.compile(r'<[^>]+>')
+
+def _visible_text(page):
+    """Title and the start of the visible text of an HTML page, like CLASSIFY_SCRIPT
+    reads in the browser. Embedded scripts and data never count, nor do JSON bodies."""
+    if not (page or '').lstrip().startswith('<'):
+        return ''
+    page = HIDDEN_RE.sub(' ', page)
+    title = TITLE_RE.search(page)
+    text = TAG_RE.sub(' ', page)
+    return html.unescape(f"{title.group(1) if title else ''} {text}")[:3000]
+
+def classify_response(status, text, url=None):
+    """Same classes for a plain HTTP response: the status and the final (redirected)
+    URL first, then the title and visible text"""
+    if status == 429:
+        return 'blocked'
+    outcome = _classify(url, '')
+    if outcome:
+        return outcome
+    outcome = _classify('', _visible_text(text))
+    if outcome:
+        return outcome
+    if status in (403, 503):
+        return 'blocked'
+    return 'ok'
+
+def check_page(scraper, ready_selector):
+    """Classify the scraper's current page and feed the outcome to its rate controller.
+    On a block the browser is swapped for a fresh one and PageBlocked is raised, so the
+    caller's unit of work goes back to the queue."""
+    outcome = classify_page(scraper.driver, ready_selector)
+    scraper.rate.record(outcome)
+    if outcome in BLOCK_OUTCOMES:
+        try:
+            url = scraper.driver.current_url
+        except Exception:
+            url = None
+        scraper.driver = scraper.driver_manager.recycle(outcome)
+        raise PageBlocked(outcome, url)
+    return outcome
+
+class RateController:
+    """Per-service pacing and concurrency, adjusted AIMD-style: every good page nudges
+    the in-flight limit up and the delay down, every block halves the limit, doubles
+    the delay and pauses all navigation for an exponentially growing backoff."""
+
+    def __init__(self, service, max_concurrency=RATE_MAX_CONCURRENCY, min_delay=RATE_MIN_DELAY, max_delay=RATE_MAX_DELAY):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.limit = float(max_concurrency)
+        self.delay = min_delay
+        self.in_flight = 0
+        self.strikes = 0
+        self.backoff_until = 0
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self._next_at = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the service's navigation slots, waiting for pacing and backoff"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            now = time.monotonic()
+            start = max(now, self._next_at, self.backoff_until)
+            self._next_at = start + self.delay
+        try:
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, outcome):
+        with self._cond:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            metrics.count('pages', service=self.service, outcome=outcome)
+            if outcome == 'ok':
+                self.strikes = 0
+                # Additive increase: about one more slot per `limit` good pages
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.delay = max(self.min_delay, self.delay - RATE_DELAY_STEP)
+            elif outcome in BLOCK_OUTCOMES:
+                self.strikes += 1
+                self.limit = max(1.0, self.limit / 2)
+                self.delay = min(self.max_delay, max(self.delay * 2, 0.5))
+                backoff = min(RATE_MAX_BACKOFF_SECONDS, RATE_BACKOFF_SECONDS * 2 ** (self.strikes - 1))
+                self.backoff_until = time.monotonic() + backoff
+                print(f"[{self.service}] {outcome} page, backing off {backoff:.0f}s "
+                      f"(limit {int(self.limit)}, delay {self.delay:.1f}s)")
+            self._cond.notify_all()
+
+    def pages(self):
+        """Pages classified so far, i.e. page loads and HTTP fetches"""
+        with self._cond:
+            return sum(self.outcomes.values())
+
+    def format(self):
+        with self._cond:
+            counts = ', '.join(f"{outcome} {count}" for outcome, count in self.outcomes.items() if count)
+            return f"{self.service}: {counts or 'no pages'}; limit {int(self.limit)}, delay {self.delay:.1f}s"
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def rate_controller(service):
+    """The process-wide controller for `service`, shared by all its scrapers"""
+    with _controllers_lock:
+        if service not in _controllers:
+            _controllers[service] = RateController(service)
+        return _controllers[service]
+
+def format_rate_stats():
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return '\n'.join(controller.format() for controller in controllers)
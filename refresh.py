@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+import pandas as pd
+from place_key import canonical_place_key
+from config import REFRESH_MAX_AGE_DAYS, REFRESH_REQUIRED_FIELDS
+
+# Fields compared and updated when a place is extracted again
+TRACKED_FIELDS = ['title', 'rating', 'reviews', 'category', 'address', 'website', 'phone']
+
+def now_stamp():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and value != value) or str(value).strip() == ''
+
+def with_place_keys(df):
+    """One row per canonical place (the last one wins), keyed by a place_key column.
+    Rows with neither a place key nor a link are kept as they are."""
+    df = df.copy()
+    if 'place_key' not in df:
+        df['place_key'] = None
+    missing = df['place_key'].isna() & df.get('link', pd.Series(index=df.index, dtype=object)).notna()
+    if missing.any():
+        df.loc[missing, 'place_key'] = df.loc[missing, 'link'].map(canonical_place_key)
+    keyed = df['place_key'].notna()
+    deduped = df[keyed].drop_duplicates('place_key', keep='last')
+    return pd.concat([deduped, df[~keyed]]).sort_index()
+
+def stale_mask(df, max_age_days=REFRESH_MAX_AGE_DAYS, required=REFRESH_REQUIRED_FIELDS):
+    """Rows scraped longer ago than `max_age_days`, never timestamped, or missing one
+    of the `required` fields. Expects the frame read with dtype=str."""
+    if 'scraped_at' in df:
+        scraped = pd.to_datetime(df['scraped_at'], errors='coerce', utc=True)
+    else:
+        scraped = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+    cutoff = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=max_age_days)
+    stale = scraped.isna() | (scraped < cutoff)
+    for field in required:
+        if field in df:
+            stale |= df[field].fillna('').astype(str).str.strip() == ''
+        else:
+            stale |= True
+    linked = df['link'].notna() if 'link' in df else pd.Series(False, index=df.index)
+    return stale & linked
+
+def service_of(record):
+    place_key = record.get('place_key')
+    if isinstance(place_key, str) and place_key.startswith('yandex:'):
+        return 'Yandex'
+    return record.get('source') if record.get('source') in ('Google', 'Yandex') else 'Google'
+
+def apply_update(record, place_data, scraped_at):
+    """Merge freshly extracted values into `record`. A field the page did not show keeps
+    its old value. Returns the (field, old, new) changes made."""
+    changes = []
+    for field in TRACKED_FIELDS:
+        new = place_data.get(field)
+        if _blank(new):
+            continue
+        old = record.get(field)
+        if _blank(old) or str(old).strip() != str(new).strip():
+            changes.append((field, None if _blank(old) else old, new))
+            record[field] = new
+    record['scraped_at'] = scraped_at
+    return changes
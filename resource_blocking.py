@@ -0,0 +1,79 @@
+import json
+import threading
+from config import RESOURCE_BLOCKING_PROFILE, BLOCK_PROFILES, COLLECT_NETWORK_STATS
+
+class NetworkStats:
+    """Blocked request and transferred byte counters across all drivers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.finished_requests = 0
+        self.transferred_bytes = 0
+
+    def add(self, blocked_by_type, finished, transferred):
+        with self._lock:
+            for resource_type, count in blocked_by_type.items():
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + count
+                self.blocked_requests += count
+            self.finished_requests += finished
+            self.transferred_bytes += transferred
+
+    def format(self):
+        with self._lock:
+            by_type = ', '.join(f"{t}: {c}" for t, c in sorted(self.blocked_by_type.items()))
+            return (f"Blocked {self.blocked_requests} requests ({by_type or 'none'}), "
+                    f"loaded {self.finished_requests} requests, {self.transferred_bytes / 1048576:.1f} MB transferred")
+
+network_stats = NetworkStats()
+
+def configure_blocking_options(options, profile=RESOURCE_BLOCKING_PROFILE):
+    """Browser-level settings that must be set before the driver starts"""
+    if COLLECT_NETWORK_STATS:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if not profile:
+        return
+    if BLOCK_PROFILES[profile].get('disable_images'):
+        options.add_argument('--blink-settings=imagesEnabled=false')
+
+def apply_resource_blocking(driver, profile=RESOURCE_BLOCKING_PROFILE):
+    """Install URL blocking through the DevTools protocol on a fresh driver"""
+    if not profile:
+        return
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCK_PROFILES[profile]['patterns']})
+    except Exception as e:
+        print(f"Resource blocking unavailable: {e}")
+
+def collect_network_stats(driver):
+    """Drain the performance log into network_stats.
+    Blocked requests are never fetched, so only their count is known, not their size."""
+    if not COLLECT_NETWORK_STATS:
+        return
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return
+    
+    request_types = {}
+    blocked_by_type = {}
+    finished = 0
+    transferred = 0
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+        if method == 'Network.requestWillBeSent':
+            request_types[params.get('requestId')] = params.get('type', 'Other')
+        elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+            resource_type = params.get('type') or request_types.get(params.get('requestId'), 'Other')
+            blocked_by_type[resource_type] = blocked_by_type.get(resource_type, 0) + 1
+        elif method == 'Network.loadingFinished':
+            finished += 1
+            transferred += int(params.get('encodedDataLength', 0))
+    network_stats.add(blocked_by_type, finished, transferred)
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from colorama import Fore, Style
+from config import SINK_FLUSH_SECONDS
+
+RESULT_COLUMNS = ['title', 'rating', 'reviews', 'category', 'address', 'website', 'phone',
+                  'link', 'place_key', 'city', 'country', 'search_query', 'source', 'scraped_at']
+
+def _clean(record):
+    # Rows loaded back from CSV carry NaN for empty cells, which JSON cannot hold
+    return {key: (None if isinstance(value, float) and value != value else value) for key, value in record.items()}
+
+class ResultSink:
+    """Appends each accepted record to the output files as it arrives, so a save costs
+    the same at record 10 as at record 50,000. Every record goes to an NDJSON journal
+    (and the CSV, if chosen); the JSON file is written from the journal by finalize()."""
+
+    def __init__(self, format_choice, country_name, first_query, flush_seconds=SINK_FLUSH_SECONDS):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_country = country_name.replace(' ', '_')[:30]
+        safe_query = first_query.replace(' ', '_')[:30]
+        base = f"{safe_country}_{safe_query}_{timestamp}"
+
+        self.base = base
+        self.csv_path = f"{base}.csv" if format_choice in [1, 3] else None
+        self.json_path = f"{base}.json" if format_choice in [2, 3] else None
+        self.journal_path = f"{base}.ndjson"
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self.extra_columns = set()
+        self._last_flush = time.monotonic()
+        self._finalized = False
+        self._lock = threading.Lock()
+
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        self.csv_file = None
+        if self.csv_path:
+            self.csv_file = open(self.csv_path, 'w', encoding='utf-8-sig', newline='')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+
+    def write(self, record):
+        record = _clean(record)
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            # Late writes from a service thread after an interrupt are dropped
+            if self._finalized:
+                return
+            self.journal.write(line)
+            if self.csv_file:
+                self.csv_writer.writerow(record)
+                self.extra_columns.update(key for key in record if key not in RESULT_COLUMNS)
+            self.count += 1
+            if time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        for handle in (self.journal, self.csv_file):
+            if handle:
+                handle.flush()
+                os.fsync(handle.fileno())
+        self._last_flush = time.monotonic()
+
+    def _records(self):
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                yield json.loads(line)
+
+    def _rewrite_csv(self, records):
+        columns = RESULT_COLUMNS + sorted(self.extra_columns)
+        with open(self.csv_path, 'w', encoding='utf-8-sig', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(records)
+
+    def _write_json(self, records):
+        with open(self.json_path, 'w', encoding='utf-8') as handle:
+            handle.write('[')
+            for idx, record in enumerate(records):
+                handle.write(',\n' if idx else '\n')
+                handle.write(json.dumps(record, ensure_ascii=False, indent=2))
+            handle.write('\n]\n')
+
+    def finalize(self, regroup=None):
+        """Close the files and write the JSON output. `regroup`, if given, reorders the
+        whole dataset once (e.g. group_by_phone) and the CSV is rewritten in that order."""
+        with self._lock:
+            if self._finalized:
+                return
+            self._finalized = True
+            self._flush()
+            self.journal.close()
+            if self.csv_file:
+                self.csv_file.close()
+
+        if not self.count:
+            print(f"{Fore.RED}No data to save.{Style.RESET_ALL}")
+            for path in (self.csv_path, self.journal_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            return
+
+        records = None
+        if regroup:
+            records = regroup(list(self._records()))
+        if self.csv_path and (regroup or self.extra_columns):
+            self._rewrite_csv(records if records is not None else self._records())
+        if self.csv_path:
+            print(f"{Fore.GREEN}✓ Saved: {self.csv_path} ({self.count} records){Style.RESET_ALL}")
+
+        if self.json_path:
+            self._write_json(records if records is not None else self._records())
+            print(f"{Fore.GREEN}✓ Saved: {self.json_path} ({self.count} records){Style.RESET_ALL}")
+        os.remove(self.journal_path)
@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from novelty import QueryNovelty
+from config import (SCHEDULE_FEED_CAP, SCHEDULE_PRIOR_RATE, SCHEDULE_PRIOR_WEIGHT, SCHEDULE_UNIT_SECONDS,
+                    SCHEDULE_PLACE_SECONDS, SCHEDULE_NEIGHBOUR_KM, SCHEDULE_MIN_EXPECTED, SCHEDULE_REPLAN_EVERY)
+
+def distance_km(a, b):
+    """Great-circle distance between two {'latitude', 'longitude'} points"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (a['latitude'], a['longitude'], b['latitude'], b['longitude']))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 12742 * math.asin(math.sqrt(h))
+
+class CityScheduler:
+    """Orders a run's units by expected new places per second and stops at a budget.
+
+    Expected new places for a city x query grow with population, at a per-capita rate
+    learned from units finished in this run and in earlier runs of the same country,
+    capped at what one result feed can show. Cities whose finished neighbours mostly
+    returned places already seen are discounted, and a city's own history from
+    earlier runs is blended in. Queries whose results are mostly places other
+    queries already found are demoted or skipped (see QueryNovelty). With a budget
+    set, units expected to add almost nothing are skipped too (and revived if the
+    estimates rise); `skip_low_yield` makes the same skips without a budget, for the
+    workers of a run whose main process has one."""
+
+    def __init__(self, queue, run_id, country_code, locations, budget_seconds=None, budget_pages=None, skip_low_yield=None):
+        self.queue = queue
+        self.run_id = run_id
+        self.country_code = country_code
+        self.locations = locations
+        self.budget_seconds = budget_seconds
+        self.budget_pages = budget_pages
+        self.skip_low_yield = bool(budget_seconds or budget_pages) if skip_low_yield is None else skip_low_yield
+        self.started = time.monotonic()
+        self.pages = 0
+        self.finished = []
+        self.skipped = 0
+        self.novelty = QueryNovelty()
+        self._since_plan = 0
+        self._lock = threading.Lock()
+        self.history = queue.yield_history(country_code, exclude_run=run_id)
+        self._last_yield = {}
+        for row in self.history:
+            self._last_yield[(row['service'], row['city'], row['query'])] = row['new']
+
+    def _population(self, city):
+        location = self.locations.get(city)
+        return location['population'] if location else 0
+
+    def _rate(self, service, query):
+        """New places per inhabitant for a service and query, with a weak prior"""
+        new = SCHEDULE_PRIOR_RATE * SCHEDULE_PRIOR_WEIGHT
+        population = SCHEDULE_PRIOR_WEIGHT
+        for row in self.history + self.finished:
+            if row['service'] == service and row['query'] == query:
+                new += row['new']
+                population += self._population(row['city'])
+        return new / population
+
+    def _costs(self):
+        """(seconds per unit, seconds per new place) observed so far, priors until then"""
+        if len(self.finished) < 3:
+            return SCHEDULE_UNIT_SECONDS, SCHEDULE_PLACE_SECONDS
+        seconds = sum(row['seconds'] for row in self.finished)
+        new = sum(row['new'] for row in self.finished)
+        overhead = max(1.0, (seconds - new * SCHEDULE_PLACE_SECONDS) / len(self.finished))
+        return overhead, SCHEDULE_PLACE_SECONDS
+
+    def _neighbour_saturation(self, service, city, query):
+        """Share of already-seen places among finished units close to `city`"""
+        here = self.locations.get(city)
+        if not here:
+            return 0.0
+        found = new = 0
+        for row in self.finished:
+            if row['service'] != service or row['query'] != query or row['city'] == city:
+                continue
+            there = self.locations.get(row['city'])
+            if there and distance_km(here, there) <= SCHEDULE_NEIGHBOUR_KM:
+                found += row['found']
+                new += row['new']
+        return 1 - new / found if found else 0.0
+
+    def expected_new(self, service, city, query, rate=None):
+        rate = self._rate(service, query) if rate is None else rate
+        expected = min(SCHEDULE_FEED_CAP, rate * self._population(city))
+        expected *= 1 - 0.8 * self._neighbour_saturation(service, city, query)
+        previous = self._last_yield.get((service, city, query))
+        if previous is not None:
+            expected = (expected + previous) / 2
+        return expected
+
+    def plan(self):
+        """Re-score every open unit and store priorities (and skips, with a budget)"""
+        with self._lock:
+            overhead, per_place = self._costs()
+            rates = {}
+            plan = []
+            skipped = 0
+            redundant = {}
+            for unit in self.queue.open_units(self.run_id):
+                key = (unit['service'], unit['query'])
+                if key not in rates:
+                    rates[key] = self._rate(*key)
+                expected = self.expected_new(unit['service'], unit['city'], unit['query'], rates[key])
+                priority = expected / (overhead + expected * per_place)
+                novelty = self.novelty.factor(*key)
+                status = 'pending'
+                if novelty == 0:
+                    status = 'skipped'
+                    redundant[key] = redundant.get(key, 0) + 1
+                elif self.skip_low_yield and expected < SCHEDULE_MIN_EXPECTED:
+                    status = 'skipped'
+                    skipped += 1
+                plan.append((unit['id'], priority * novelty, status))
+            self.skipped = skipped
+            for key, units in redundant.items():
+                self.novelty.note_skipped(*key, units)
+            self._since_plan = 0
+        self.queue.set_plan(plan)
+
+    def record(self, unit, tally, seconds, pages):
+        """Feed a finished unit's yield back into the estimates"""
+        row = {
+            'service': unit['service'], 'city': unit['city'], 'query': unit['query'],
+            'found': tally['found'], 'new': tally['new'], 'added': tally['added'],
+            'pages': pages, 'seconds': seconds
+        }
+        self.queue.record_yield(self.run_id, country_code=self.country_code, **row)
+        # A query that just turned redundant should stop being leased right away
+        redundant = self.novelty.record(unit['service'], unit['query'], tally['found'], tally['new'])
+        with self._lock:
+            self.finished.append(row)
+            self.pages += pages
+            self._since_plan += 1
+            replan = redundant or self._since_plan >= SCHEDULE_REPLAN_EVERY
+        if replan:
+            self.plan()
+
+    def seconds_per_unit(self):
+        with self._lock:
+            if not self.finished:
+                return None
+            return sum(row['seconds'] for row in self.finished) / len(self.finished)
+
+    def exhausted(self):
+        if self.budget_seconds and time.monotonic() - self.started >= self.budget_seconds:
+            return True
+        return bool(self.budget_pages and self.pages >= self.budget_pages)
+
+    def format(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            added = sum(row['added'] for row in self.finished)
+            rate = f", {added / (elapsed / 3600):.0f} new per hour" if elapsed >= 60 else ''
+            return (f"{len(self.finished)} units, {added} added, {self.pages} pages in {elapsed / 60:.1f} min{rate}; "
+                    f"{self.skipped} units skipped as low-yield")
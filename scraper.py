@@ -1,13 +1,34 @@
-import time
+from urllib.parse import quote_plus
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
-from config import IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, SCROLL_PAUSE_TIME, MAX_SCROLL_ATTEMPTS, CHROME_BINARY_PATH, MAX_PLACES_PER_CITY, EXTRACT_WAIT_TIME
+from extraction import GOOGLE_FIELDS, GOOGLE_PARSERS, GOOGLE_CARD_SCRIPT, extract_fields, parse_fields, parse_google_card
+from config import IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, MAX_SCROLL_ATTEMPTS, CHROME_BINARY_PATH, MAX_PLACES_PER_CITY, WAIT_TIMEOUTS, PAGE_CAPTURE_MODE, SCROLL_STALE_STEPS
+from waits import wait_until_ready
+from page_store import PageStore
+from place_key import canonical_place_key
+from driver_manager import DriverManager
+from driver_provisioning import get_chromedriver
+from search_cache import search_key, cached_search
+from rate_control import rate_controller, check_page, PageBlocked
+from metrics import metrics, count_missing_fields
+from resource_blocking import configure_blocking_options, apply_resource_blocking, collect_network_stats
+
+def search_url(query, city, country, location=None, base_url='https://www.google.com'):
+    if location:
+        # The viewport already bounds the search, the city name would re-center it
+        return f"{base_url}/maps/search/{quote_plus(query)}/@{location['lat']:.6f},{location['lng']:.6f},{location['zoom']}z"
+    search_query = f"{query} in {city}, {country}"
+    # Encoded, so '&', '#' or '/' in a query cannot end the path segment
+    return f"{base_url}/maps/search/{quote_plus(search_query)}"
 
 class GoogleMapsScraper:
     def __init__(self, headless=True, browser='auto'):
-        self.driver = self._setup_driver(headless, browser)
+        self.driver_manager = DriverManager(lambda: self._setup_driver(headless, browser))
+        self.driver = self.driver_manager.acquire()
+        self.page_store = PageStore() if PAGE_CAPTURE_MODE else None
+        self.rate = rate_controller('Google')
         
     def _setup_driver(self, headless, browser):
         if browser == 'auto':
@@ -30,6 +51,8 @@ class GoogleMapsScraper:
         is_windows = platform.system() == 'Windows'
         
         options = ChromeOptions()
+        # Hand control back at DOMContentLoaded, readiness waits take it from there
+        options.page_load_strategy = 'eager'
         if headless:
             options.add_argument('--headless=new')
         options.add_argument('--no-sandbox')
@@ -45,17 +68,19 @@ class GoogleMapsScraper:
         
         if CHROME_BINARY_PATH and os.path.exists(CHROME_BINARY_PATH):
             options.binary_location = CHROME_BINARY_PATH
+        configure_blocking_options(options)
         
-        # Try auto-detection first (works on Windows), fallback to webdriver-manager
-        try:
+        # Cached driver for this Chrome version, Selenium's own lookup if there is none
+        driver_path = get_chromedriver()
+        if driver_path:
+            driver = webdriver.Chrome(service=ChromeService(driver_path), options=options)
+        else:
             driver = webdriver.Chrome(options=options)
-        except:
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
         
         driver.implicitly_wait(IMPLICIT_WAIT)
         driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(max(WAIT_TIMEOUTS.values()) + 5)
+        apply_resource_blocking(driver)
         return driver
     
 
@@ -63,202 +88,160 @@ class GoogleMapsScraper:
         raise Exception("Firefox not supported. Use Chrome.")
     
     def search_places(self, query, city, country):
-        search_query = f"{query} in {city}, {country}"
-        url = f"https://www.google.com/maps/search/{search_query.replace(' ', '+')}"
+        return [card['link'] for card in self.search_cards(query, city, country)]
+    
+    def search_cards(self, query, city, country):
+        """Search and return partial place records parsed from the result feed"""
+        return list(self.iter_cards(query, city, country))
+    
+    def iter_cards(self, query, city, country, seen_places=None, limit=MAX_PLACES_PER_CITY, location=None):
+        """Yield feed cards as they appear while the result feed scrolls, or straight
+        from the search cache when this search ran recently.
+        Stops at `limit` cards, or after SCROLL_STALE_STEPS steps that only
+        surfaced place keys already in `seen_places`. `location` is an optional
+        tile ({'lat', 'lng', 'zoom'}) that pins the search to a map viewport."""
+        key = search_key('Google', query, city, country, location)
+        return cached_search(key, limit, lambda status: self._iter_search_cards(query, city, country, seen_places, limit, location, status))
+    
+    def _iter_search_cards(self, query, city, country, seen_places, limit, location, status):
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        
+        url = search_url(query, city, country, location)
         
         try:
-            self.driver.get(url)
-            time.sleep(2)
-            self._scroll_results()
-            links = self._extract_place_links()
-            if MAX_PLACES_PER_CITY:
-                return links[:MAX_PLACES_PER_CITY]
-            return links
+            with self.rate.slot(), metrics.timer('page_load_seconds', service='Google', page='search'):
+                self.driver.get(url)
+                wait_until_ready(self.driver, 'google_search')
         except Exception as e:
             print(f"Search error: {e}")
-            return []
-    
-    def _scroll_results(self):
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
+            return
+        check_page(self, 'div[role="feed"], a[href*="/maps/place/"], h1')
         
+        emitted = set()
+        read = 0
         try:
-            wait = WebDriverWait(self.driver, 10)
-            scrollable_div = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="feed"]')))
+            scrollable_div = WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="feed"]'))
+            )
+        except:
+            # No feed: a single match opens its place page directly
+            scrollable_div = None
+        
+        no_change_count = 0
+        stale_steps = 0
+        last_height = 0
+        complete = False
+        for step in range(MAX_SCROLL_ATTEMPTS + 1):
+            read, cards = self._read_place_cards(read)
+            fresh = 0
+            for card in cards:
+                if card['place_key'] in emitted:
+                    continue
+                emitted.add(card['place_key'])
+                if seen_places is None or card['place_key'] not in seen_places:
+                    fresh += 1
+                yield card
+                if limit and len(emitted) >= limit:
+                    break
             
-            no_change_count = 0
-            last_height = 0
+            if limit and len(emitted) >= limit:
+                complete = True
+                break
+            stale_steps = 0 if fresh else stale_steps + 1
+            if scrollable_div is None or no_change_count >= 3 or step == MAX_SCROLL_ATTEMPTS:
+                complete = True
+                break
+            # Cut short on repeats: the rest of the feed is unseen, so it is not cached
+            if stale_steps >= SCROLL_STALE_STEPS:
+                break
             
-            for _ in range(MAX_SCROLL_ATTEMPTS):
-                self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
-                time.sleep(SCROLL_PAUSE_TIME)
-                new_height = self.driver.execute_script("return arguments[0].scrollHeight", scrollable_div)
-                
-                if new_height == last_height:
-                    no_change_count += 1
-                    if no_change_count >= 3:
-                        break
-                else:
-                    no_change_count = 0
-                last_height = new_height
-        except Exception as e:
-            print(f"Scroll error: {e}")
+            try:
+                with metrics.timer('scroll_step_seconds', service='Google'):
+                    self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
+                    wait_until_ready(self.driver, 'google_scroll', [scrollable_div, last_height])
+                    new_height = self.driver.execute_script("return arguments[0].scrollHeight", scrollable_div)
+            except Exception as e:
+                print(f"Scroll error: {e}")
+                break
+            
+            if new_height == last_height:
+                no_change_count += 1
+            else:
+                no_change_count = 0
+            last_height = new_height
+        
+        status['complete'] = complete
+        collect_network_stats(self.driver)
     
     def _extract_place_links(self):
-        links = []
+        return [card['link'] for card in self._extract_place_cards()]
+    
+    def _extract_place_cards(self):
+        return self._read_place_cards()[1]
+    
+    def _read_place_cards(self, start=0):
+        """Parse feed cards from anchor `start` on. Returns (anchors seen, cards)"""
+        cards = {}
+        count = start
         try:
-            elements = self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="/maps/place/"]')
-            for element in elements:
-                href = element.get_attribute('href')
-                if href and '/maps/place/' in href and href not in links:
-                    links.append(href)
+            result = self.driver.execute_script(GOOGLE_CARD_SCRIPT, start) or {}
+            count = result.get('count', start)
+            for raw in result.get('cards', []):
+                href = raw.get('link')
+                if not href or '/maps/place/' not in href:
+                    continue
+                key = canonical_place_key(href)
+                if key not in cards:
+                    cards[key] = parse_google_card(raw)
+                    cards[key]['place_key'] = key
         except Exception as e:
             print(f"Error extracting links: {e}")
-        return links
+        return count, list(cards.values())
     
     def extract_place_data(self, url):
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
-        
+        try:
+            with metrics.timer('place_seconds', service='Google'):
+                data = self._extract_place_data(url)
+            metrics.count('places', service='Google', result='ok' if data else 'empty')
+            return data
+        finally:
+            self.driver = self.driver_manager.page_done()
+    
+    def _extract_place_data(self, url):
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                self.driver.get(url)
-                time.sleep(EXTRACT_WAIT_TIME)
+                with self.rate.slot(), metrics.timer('page_load_seconds', service='Google', page='place'):
+                    self.driver.get(url)
+                    wait_until_ready(self.driver, 'google_place')
+                check_page(self, 'h1')
                 
-                # Wait for page to load
-                try:
-                    wait = WebDriverWait(self.driver, 10)
-                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.DUwDvf')))
-                except:
-                    pass
+                if self.page_store:
+                    self.page_store.put(canonical_place_key(url), url, self.driver.page_source, source='Google')
+                    if PAGE_CAPTURE_MODE == 'store_only':
+                        return None
                 
-                try:
-                    self.driver.execute_script("window.scrollTo(0, 300);")
-                    time.sleep(0.3)
-                except:
-                    pass
-                
-                data = {
-                    'title': self._safe_extract(self._get_title),
-                    'rating': self._safe_extract(self._get_rating),
-                    'reviews': self._safe_extract(self._get_reviews),
-                    'category': self._safe_extract(self._get_category),
-                    'address': self._safe_extract(self._get_address),
-                    'website': self._safe_extract(self._get_website),
-                    'phone': self._safe_extract(self._get_phone),
-                    'link': url
-                }
+                with metrics.timer('extract_fields_seconds', service='Google'):
+                    data = parse_fields(extract_fields(self.driver, GOOGLE_FIELDS), GOOGLE_PARSERS)
+                count_missing_fields('Google', data)
+                data['link'] = url
+                data['place_key'] = canonical_place_key(url)
+                collect_network_stats(self.driver)
                 return data
+            except PageBlocked:
+                raise
             except Exception as e:
                 if 'tab crashed' in str(e) or 'session' in str(e).lower():
                     if attempt < max_retries - 1:
                         print(f"Tab crashed, restarting browser...")
                         self._restart_driver()
-                        time.sleep(2)
                         continue
                 return None
         return None
     
     def _restart_driver(self):
-        try:
-            self.driver.quit()
-        except:
-            pass
-        time.sleep(1)
-        self.driver = self._setup_driver(True, 'chrome')
-    
-    def _safe_extract(self, func):
-        try:
-            return func()
-        except:
-            return None
-    
-    def _get_title(self):
-        return self.driver.find_element(By.CSS_SELECTOR, 'h1.DUwDvf').text
-    
-    def _get_rating(self):
-        rating_elem = self.driver.find_element(By.CSS_SELECTOR, 'div.F7nice span[aria-hidden="true"]')
-        return rating_elem.text
-    
-    def _get_reviews(self):
-        reviews_elem = self.driver.find_element(By.CSS_SELECTOR, 'div.F7nice span[aria-label*="reviews"]')
-        aria_label = reviews_elem.get_attribute('aria-label')
-        return aria_label.split()[0].replace(',', '')
-    
-    def _get_category(self):
-        return self.driver.find_element(By.CSS_SELECTOR, 'button.DkEaL').text
-    
-    def _get_address(self):
-        # Try multiple selectors
-        selectors = [
-            'button[data-item-id="address"]',
-            'button[data-tooltip="Copy address"]',
-            '[data-item-id="address"] div.fontBodyMedium'
-        ]
-        
-        for selector in selectors:
-            try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                for elem in elements:
-                    aria_label = elem.get_attribute('aria-label')
-                    if aria_label:
-                        if 'Address:' in aria_label:
-                            return aria_label.replace('Address:', '').strip()
-                        if 'Adres:' in aria_label:
-                            return aria_label.replace('Adres:', '').strip()
-                    text = elem.text
-                    if text and len(text) > 10:
-                        return text
-            except:
-                continue
-        return None
-    
-    def _get_website(self):
-        selectors = [
-            'a[data-item-id="authority"]',
-            'a[data-tooltip="Open website"]',
-            'a[aria-label*="Website"]',
-            'a[aria-label*="İnternet sitesi"]'
-        ]
-        
-        for selector in selectors:
-            try:
-                links = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                for link in links:
-                    href = link.get_attribute('href')
-                    if href and 'google.com' not in href:
-                        return href
-            except:
-                continue
-        return None
-    
-    def _get_phone(self):
-        selectors = [
-            'button[data-item-id*="phone"]',
-            'button[data-tooltip="Copy phone number"]',
-            '[data-item-id*="phone"] div.fontBodyMedium',
-            'button[aria-label*="Phone"]',
-            'button[aria-label*="Telefon"]'
-        ]
-        
-        for selector in selectors:
-            try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                for elem in elements:
-                    aria_label = elem.get_attribute('aria-label')
-                    if aria_label:
-                        if 'Phone:' in aria_label:
-                            return aria_label.replace('Phone:', '').strip()
-                        if 'Telefon:' in aria_label:
-                            return aria_label.replace('Telefon:', '').strip()
-                    text = elem.text
-                    if text and ('+' in text or text.replace(' ', '').replace('-', '').isdigit()):
-                        return text
-            except:
-                continue
-        return None
+        self.driver = self.driver_manager.recycle('crash')
     
     def close(self):
-        if self.driver:
-            self.driver.quit()
+        self.driver_manager.close()
@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import threading
+import time
+from config import SEARCH_CACHE_ENABLED, SEARCH_CACHE_PATH, SEARCH_CACHE_TTL_HOURS, SEARCH_CACHE_MAX_ENTRIES, SQLITE_JOURNAL_MODE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    cards TEXT NOT NULL,
+    card_limit INTEGER,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS searches_by_use ON searches (used_at);
+"""
+
+def search_key(service, query, city, country, location=None):
+    key = f"{service}|{country}|{city}|{query}".lower()
+    if location:
+        key += f"|{location['lat']:.5f},{location['lng']:.5f},{location['zoom']}"
+    return key
+
+class SearchCache:
+    """Result cards of recent searches, so reruns, retries and other shards on the same
+    machine go straight to extraction. Entries expire after `ttl_hours`; past
+    `max_entries` the least recently used are dropped."""
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl_hours=SEARCH_CACHE_TTL_HOURS, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        self.db.executescript(SCHEMA)
+
+    def get(self, key, limit=None):
+        """Cached cards for `key`, or None if missing, expired or cut shorter than `limit`"""
+        now = time.time()
+        with self._lock:
+            row = self.db.execute(
+                "SELECT cards, card_limit FROM searches WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+            ).fetchone()
+            # A search cut off at a smaller limit cannot answer a bigger one
+            if row is None or (row[1] is not None and (limit is None or limit > row[1])):
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE searches SET used_at = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+        cards = json.loads(row[0])
+        return cards[:limit] if limit else cards
+
+    def put(self, key, cards, limit=None):
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(cards, ensure_ascii=False), limit, now, now)
+            )
+            self.db.execute("DELETE FROM searches WHERE created_at < ?", (now - self.ttl,))
+            self.db.execute(
+                "DELETE FROM searches WHERE key IN (SELECT key FROM searches ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.db.commit()
+
+    def format(self):
+        total = self.hits + self.misses
+        rate = f" ({self.hits / total:.0%})" if total else ''
+        return f"{self.hits} hits, {self.misses} misses{rate}"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def search_cache():
+    """The process-wide cache, None when caching is disabled"""
+    global _cache
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
+
+def cached_search(key, limit, search):
+    """Yield the cached cards for `key`, or run `search(status)` and cache what it yields.
+    The search sets status['complete'] when it ended at the end of the feed or at
+    `limit`; a search cut short (stale scroll steps, errors, abandoned midway) or
+    one that found nothing is not stored, as a fresh search would return more."""
+    cache = search_cache()
+    if cache is None:
+        yield from search({})
+        return
+    cards = cache.get(key, limit)
+    if cards is not None:
+        yield from cards
+        return
+    collected = []
+    status = {}
+    for card in search(status):
+        collected.append(card)
+        yield card
+    if collected and status.get('complete'):
+        cache.put(key, collected, limit)
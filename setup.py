@@ -20,7 +20,6 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "selenium>=4.16.0",
-        "webdriver-manager>=4.0.1",
         "pandas>=2.1.4",
         "python-dotenv>=1.0.0",
         "colorama>=0.4.6",
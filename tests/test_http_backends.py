@@ -0,0 +1,199 @@
+"""Parses synthetic Google and Yandex pages through the HTTP backends, served from a
+local stand-in for the Maps host (the backends' `base_url`).
+
+The pages in fixtures/ are written by hand in the shape of real pages, holding only
+the payload the parsers read. Check them against real captures (PAGE_CAPTURE_MODE)
+when the sites change their layout.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, unquote_plus, urlsplit
+import yandex_http
+from google_http import GoogleMapsHttpScraper
+from rate_control import PageBlocked
+from translit import OUT_OF_TOWN
+from yandex_http import YandexMapsHttpScraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like maps.google.com / yandex.ru/maps, from the fixtures"""
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        self.server.requests.append(self.path)
+        if parts.path.startswith('/maps/search/'):
+            body, kind = fixture('google_search.html'), 'text/html'
+        elif parts.path.startswith('/maps/place/'):
+            body, kind = fixture('google_place.html'), 'text/html'
+        elif parts.path == '/maps/api/search':
+            skip = int(parse_qs(parts.query).get('skip', ['0'])[0])
+            body = fixture('yandex_search_api.json') if skip == 2 else json.dumps({'data': {'items': []}})
+            kind = 'application/json'
+        elif parts.path.startswith('/maps/org/captcha/'):
+            self.send_response(302)
+            self.send_header('Location', f"/showcaptcha?retpath={parts.path}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        elif parts.path == '/showcaptcha':
+            body, kind = '<html><head><title>Вы не робот?</title></head><body><form></form></body></html>', 'text/html'
+        elif parts.path.startswith('/maps/org/'):
+            body, kind = fixture('yandex_place.html'), 'text/html'
+        elif parts.path.rstrip('/') == '/maps':
+            body, kind = fixture('yandex_search.html'), 'text/html'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f"{kind}; charset=utf-8")
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def no_browser():
+    raise AssertionError("the HTTP backend fell back to a browser")
+
+class HttpBackendTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.server.requests = []
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+
+    def open(self, scraper_class):
+        scraper = scraper_class(base_url=self.base_url)
+        scraper.driver_manager.acquire = no_browser
+        self.addCleanup(scraper.close)
+        return scraper
+
+class GoogleHttpTest(HttpBackendTest):
+
+    def test_search_cards(self):
+        scraper = self.open(GoogleMapsHttpScraper)
+        status = {}
+        cards = list(scraper._iter_search_cards('diesel service', 'Tashkent', 'Uzbekistan', None, None, None, status))
+
+        self.assertEqual(scraper.fallbacks, 0)
+        # One page of a longer feed must not be cached as the whole search
+        self.assertFalse(status.get('complete'))
+        self.assertEqual([card['title'] for card in cards], ['Diesel Service Center', 'Toshkent Motors', 'Chilonzor Diesel'])
+        self.assertEqual(cards[0], {
+            'title': 'Diesel Service Center',
+            'rating': '4.6',
+            'reviews': '128',
+            'category': 'Auto repair shop',
+            'address': 'Amir Temur Avenue 107, Tashkent, Uzbekistan',
+            'website': 'https://diesel-service.uz/',
+            'phone': '+998 71 200 10 20',
+            'link': f"{self.base_url}/maps/place/data=!4m2!3m1!1s0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11",
+            'place_key': 'google:0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11'
+        })
+        # Google redirect links are not the business's website
+        self.assertIsNone(cards[2]['website'])
+        self.assertIsNone(cards[2]['phone'])
+
+    def test_search_url_encodes_query(self):
+        scraper = self.open(GoogleMapsHttpScraper)
+        list(scraper._iter_search_cards('tyre & diesel #1 / 24h', 'Tashkent', 'Uzbekistan', None, None, None, {}))
+
+        path = urlsplit(self.server.requests[0]).path
+        self.assertEqual(unquote_plus(path[len('/maps/search/'):]), 'tyre & diesel #1 / 24h in Tashkent, Uzbekistan')
+
+    def test_place_page_picks_its_own_place(self):
+        scraper = self.open(GoogleMapsHttpScraper)
+        url = 'https://www.google.com/maps/place/Diesel+Service+Center/data=!4m7!3m6!1s0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11!8m2'
+        data = scraper.extract_place_data(url)
+
+        self.assertEqual(scraper.fallbacks, 0)
+        self.assertEqual(data['title'], 'Diesel Service Center')
+        self.assertEqual(data['phone'], '+998 71 200 10 20')
+        self.assertEqual(data['link'], url)
+        self.assertEqual(data['place_key'], 'google:0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11')
+        self.assertTrue(self.server.requests[0].startswith('/maps/place/Diesel+Service+Center/'))
+
+class YandexHttpTest(HttpBackendTest):
+
+    def test_search_cards_across_pages(self):
+        scraper = self.open(YandexMapsHttpScraper)
+        status = {}
+        with mock.patch.object(yandex_http, 'SEARCH_PAGE_SIZE', 2):
+            cards = list(scraper._iter_search_cards('дизель сервис', 'Tashkent', 'Uzbekistan', None, None, status))
+
+        self.assertEqual(scraper.fallbacks, 0)
+        self.assertTrue(status['complete'])
+        # Chirchiq is another city; the in-city address without a city name is kept
+        self.assertEqual([card['title'] for card in cards], ['Дизель Сервис', 'Мотор Плюс', 'Турбо Сервис'])
+        self.assertEqual(cards[0], {
+            'title': 'Дизель Сервис',
+            'rating': '4.7',
+            'reviews': '85',
+            'category': 'Автосервис, автотехцентр',
+            'address': 'Узбекистан, Ташкент, улица Амира Темура, 107',
+            'website': 'http://dizel-servis.uz/',
+            'phone': '+998 71 200-10-20',
+            'link': f"{self.base_url}/maps/org/dizel_servis/1124715036/",
+            'place_key': 'yandex:1124715036'
+        })
+        # Only a social profile: it stands in for the website
+        self.assertEqual(cards[1]['website'], 'https://instagram.com/motorplus.uz')
+
+        api = [parse_qs(urlsplit(path).query) for path in self.server.requests if path.startswith('/maps/api/search')]
+        self.assertEqual([query['skip'] for query in api], [['2'], ['4']])
+        self.assertEqual(api[0]['csrfToken'], ['a1b2c3:1700000000'])
+
+    def test_org_page_picks_its_own_org(self):
+        scraper = self.open(YandexMapsHttpScraper)
+        url = 'https://yandex.ru/maps/org/dizel_servis/1124715036/'
+        data = scraper.extract_place_data(url, city='Tashkent', country='Uzbekistan')
+
+        self.assertEqual(scraper.fallbacks, 0)
+        self.assertEqual(data['title'], 'Дизель Сервис')
+        self.assertEqual(data['link'], url)
+        self.assertEqual(data['place_key'], 'yandex:1124715036')
+        self.assertEqual(self.server.requests[0], '/maps/org/dizel_servis/1124715036/')
+
+    def test_org_page_in_another_city_is_rejected(self):
+        scraper = self.open(YandexMapsHttpScraper)
+        data = scraper.extract_place_data('https://yandex.ru/maps/org/dizel_servis/1124715036/', city='Samarkand', country='Uzbekistan')
+
+        # Distinct from a page that failed to load, so the search card is not kept instead
+        self.assertEqual(data, OUT_OF_TOWN)
+        self.assertEqual(scraper.fallbacks, 0)
+
+    def test_captcha_page_is_not_retried_in_a_browser(self):
+        scraper = self.open(YandexMapsHttpScraper)
+        # The block would otherwise back off every later test
+        with mock.patch.object(scraper.rate, 'record') as record, self.assertRaises(PageBlocked) as blocked:
+            scraper.extract_place_data('https://yandex.ru/maps/org/captcha/1/', city='Tashkent', country='Uzbekistan')
+
+        self.assertEqual(blocked.exception.outcome, 'captcha')
+        record.assert_called_once_with('captcha')
+        self.assertEqual(scraper.fallbacks, 0)
+
+if __name__ == '__main__':
+    unittest.main()
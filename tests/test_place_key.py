@@ -0,0 +1,35 @@
+import unittest
+from place_key import canonical_place_key, business_key
+
+class CanonicalPlaceKeyTest(unittest.TestCase):
+
+    def test_google_feature_id_ignores_the_rest_of_the_url(self):
+        key = 'google:0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11'
+        self.assertEqual(canonical_place_key(
+            'https://www.google.com/maps/place/Diesel+Service+Center/data=!4m7!3m6!1s0x38ae8b0cc379e9c3:0x1a1f3d3e6b7c2a11!8m2!3d41.3!4d69.2?authuser=0&hl=en&rclk=1'
+        ), key)
+        self.assertEqual(canonical_place_key(
+            'https://www.google.com/maps/place/data=!4m2!3m1!1s0x38AE8B0CC379E9C3%3A0x1A1F3D3E6B7C2A11'
+        ), key)
+
+    def test_google_place_id_without_feature_id(self):
+        self.assertEqual(canonical_place_key('https://www.google.com/maps/place/?q=place_id:ChIJ2c8bJ0yLrjgRIRp6Wk0sFhw'),
+                         'google:ChIJ2c8bJ0yLrjgRIRp6Wk0sFhw')
+
+    def test_yandex_org_id_with_and_without_slug(self):
+        self.assertEqual(canonical_place_key('https://yandex.ru/maps/org/dizel_servis/1124715036/?ll=69.2%2C41.3&z=16'), 'yandex:1124715036')
+        self.assertEqual(canonical_place_key('https://yandex.uz/maps/org/1124715036/reviews/'), 'yandex:1124715036')
+
+    def test_unknown_url_drops_query_and_fragment(self):
+        self.assertEqual(canonical_place_key('https://Example.com/places/42/?utm_source=x#map'), 'url:example.com/places/42')
+        self.assertIsNone(canonical_place_key(None))
+
+class BusinessKeyTest(unittest.TestCase):
+
+    def test_missing_values_count_as_empty(self):
+        record = {'title': ' Diesel Service ', 'phone': None, 'address': float('nan')}
+        self.assertEqual(business_key(record), 'Diesel Service||')
+        self.assertEqual(business_key(record), business_key({'title': 'Diesel Service'}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import json
+import unittest
+from rate_control import classify_response
+
+class ClassifyResponseTest(unittest.TestCase):
+
+    def test_status_and_redirect_come_first(self):
+        self.assertEqual(classify_response(429, ''), 'blocked')
+        self.assertEqual(classify_response(200, '<html></html>', 'https://www.google.com/sorry/index?continue=x'), 'captcha')
+        self.assertEqual(classify_response(200, '<html></html>', 'https://consent.google.com/ml?continue=x'), 'blocked')
+        self.assertEqual(classify_response(403, '<html></html>'), 'blocked')
+
+    def test_markers_in_title_and_visible_text(self):
+        self.assertEqual(classify_response(200, '<title>Ой! Доступ ограничен</title>'), 'blocked')
+        self.assertEqual(classify_response(200, '<body><p>Our systems have detected unusual traffic</p></body>'), 'captcha')
+
+    def test_markers_in_page_data_are_content(self):
+        # Review text and script payloads on a good page may quote the markers
+        payload = json.dumps({'reviews': [{'text': 'Access denied at the gate, but I am not a robot'}]})
+        page = f"<html><head><title>Diesel Service</title><script>window.APP_STATE = {payload};</script></head><body></body></html>"
+        self.assertEqual(classify_response(200, page, 'https://www.google.com/maps/place/x'), 'ok')
+        self.assertEqual(classify_response(200, payload), 'ok')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from result_sink import ResultSink
+
+class ResultSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        # The sink writes next to the working directory, like the scraper's output files
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def test_outputs_are_rebuilt_from_the_journal(self):
+        sink = ResultSink(3, 'Uzbekistan', 'diesel service', flush_seconds=0)
+        sink.write({'title': 'Toshkent Motors', 'phone': '+998 71 200 10 20', 'rating': float('nan')})
+        sink.write({'title': 'Diesel Service Center', 'phone': None, 'hours': '9-18'})
+        sink.write({'title': 'Chilonzor Diesel', 'phone': '+998 71 200 10 20'})
+        with open(sink.journal_path, encoding='utf-8') as journal:
+            self.assertEqual(len(journal.readlines()), 3)
+
+        sink.finalize(regroup=lambda records: sorted(records, key=lambda record: record['title']))
+
+        with open(sink.json_path, encoding='utf-8') as f:
+            records = json.load(f)
+        self.assertEqual([record['title'] for record in records], ['Chilonzor Diesel', 'Diesel Service Center', 'Toshkent Motors'])
+        # NaN from CSV round trips is stored as null
+        self.assertIsNone(records[2]['rating'])
+        with open(sink.csv_path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['title'] for row in rows], ['Chilonzor Diesel', 'Diesel Service Center', 'Toshkent Motors'])
+        # Columns outside RESULT_COLUMNS are added when the CSV is rewritten
+        self.assertEqual(rows[1]['hours'], '9-18')
+
+    def test_empty_run_leaves_no_files(self):
+        sink = ResultSink(1, 'Uzbekistan', 'diesel service')
+        sink.finalize()
+
+        self.assertEqual(os.listdir('.'), [])
+
+if __name__ == '__main__':
+    unittest.main()
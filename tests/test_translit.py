@@ -0,0 +1,7 @@
+"""Runs the examples in translit's docstrings"""
+import doctest
+import translit
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(translit))
+    return tests
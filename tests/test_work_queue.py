@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import work_queue
+from work_queue import WorkQueue
+
+UNITS = [('Google', 'Tashkent', 'diesel'), ('Yandex', 'Tashkent', 'diesel'), ('Google', 'Samarkand', 'diesel')]
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = WorkQueue(os.path.join(directory.name, 'queue.db'), lease_seconds=60, max_attempts=2, max_blocks=2)
+        self.addCleanup(self.queue.close)
+        self.run_id = self.queue.create_run({'country_name': 'Uzbekistan'}, UNITS)
+
+    def later(self, seconds):
+        """Pretend `seconds` have passed since now"""
+        now = work_queue.time.time() + seconds
+        patcher = mock.patch.object(work_queue.time, 'time', return_value=now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lease_hands_out_each_unit_once_in_order(self):
+        leased = [self.queue.lease(self.run_id, 'w1') for _ in UNITS]
+
+        self.assertEqual([(unit['service'], unit['city']) for unit in leased], [(s, c) for s, c, q in UNITS])
+        self.assertEqual({unit['attempt'] for unit in leased}, {1})
+        self.assertIsNone(self.queue.lease(self.run_id, 'w2'))
+
+    def test_lease_prefers_the_open_service_then_priority(self):
+        units = {(unit['service'], unit['city']): unit['id'] for unit in self.queue.open_units(self.run_id)}
+        self.queue.set_plan([(units['Google', 'Samarkand'], 5.0, 'pending')])
+
+        self.assertEqual(self.queue.lease(self.run_id, 'w1', prefer='Yandex')['service'], 'Yandex')
+        self.assertEqual(self.queue.lease(self.run_id, 'w1', prefer='Yandex')['city'], 'Samarkand')
+        self.assertEqual(self.queue.lease(self.run_id, 'w1', service='Yandex'), None)
+
+    def test_expired_lease_goes_to_another_worker(self):
+        unit = self.queue.lease(self.run_id, 'w1', service='Yandex')
+        self.assertIsNone(self.queue.lease(self.run_id, 'w2', service='Yandex'))
+
+        self.later(61)
+        again = self.queue.lease(self.run_id, 'w2', service='Yandex')
+        self.assertEqual((again['id'], again['attempt']), (unit['id'], 2))
+        # The first worker lost the unit and cannot complete it any more
+        self.assertFalse(self.queue.heartbeat(unit['id'], 'w1'))
+        self.assertFalse(self.queue.complete(unit['id'], 'w1', [{'title': 'late'}]))
+        self.assertTrue(self.queue.complete(unit['id'], 'w2', [{'title': 'Дизель Сервис'}]))
+        self.assertEqual(self.queue.results(self.run_id), [{'title': 'Дизель Сервис'}])
+
+    def test_unit_out_of_attempts_fails_when_its_lease_expires(self):
+        for seconds in (0, 61):
+            self.later(seconds)
+            self.queue.lease(self.run_id, 'w1', service='Yandex')
+        self.later(200)
+
+        self.assertIsNone(self.queue.lease(self.run_id, 'w2', service='Yandex'))
+        self.assertEqual(self.queue.counts(self.run_id)['failed'], 1)
+
+    def test_blocked_unit_is_retried_without_spending_attempts(self):
+        unit = self.queue.lease(self.run_id, 'w1', service='Yandex')
+        self.assertTrue(self.queue.block(unit['id'], 'w1', 'captcha'))
+
+        again = self.queue.lease(self.run_id, 'w1', service='Yandex')
+        self.assertEqual(again['attempt'], 1)
+        # Blocked max_blocks times in a row: given up on
+        self.assertFalse(self.queue.block(again['id'], 'w1', 'captcha'))
+        self.assertEqual(self.queue.counts(self.run_id)['failed'], 1)
+
+    def test_failed_unit_is_retried_until_out_of_attempts(self):
+        for expected in ('pending', 'failed'):
+            unit = self.queue.lease(self.run_id, 'w1', service='Yandex')
+            self.queue.fail(unit['id'], 'w1', ValueError('no feed'))
+            self.assertEqual(self.queue.counts(self.run_id).get(expected), 1 if expected == 'failed' else 3)
+
+    def test_plan_does_not_touch_leased_units(self):
+        unit = self.queue.lease(self.run_id, 'w1')
+        self.queue.set_plan([(unit['id'], 1.0, 'skipped')])
+
+        self.assertTrue(self.queue.complete(unit['id'], 'w1', []))
+
+if __name__ == '__main__':
+    unittest.main()
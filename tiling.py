@@ -0,0 +1,86 @@
+import math
+from collections import deque
+from config import TILE_SATURATION, TILE_MAX_DEPTH, MAX_PLACES_PER_CITY
+
+# Approximate width of the Maps viewport in pixels, used to size tiles
+VIEWPORT_PIXELS = 1000
+
+def base_zoom(population):
+    """Starting zoom so the first tile roughly covers the city"""
+    if population >= 1000000:
+        return 11
+    if population >= 200000:
+        return 12
+    if population >= 50000:
+        return 13
+    return 14
+
+def tile_span(latitude, zoom):
+    """(lat, lng) extent in degrees of a viewport at this zoom"""
+    lng_span = 360 * VIEWPORT_PIXELS / (256 * 2 ** zoom)
+    lat_span = lng_span * math.cos(math.radians(latitude))
+    return lat_span, lng_span
+
+class TilePlanner:
+    """Yields @lat,lng,zoom search tiles for one city, subdividing only tiles whose
+    feed hit the result cap. Report each tile's yield back with record()."""
+
+    def __init__(self, latitude, longitude, population=0, saturation=TILE_SATURATION,
+                 max_depth=TILE_MAX_DEPTH, max_places=MAX_PLACES_PER_CITY):
+        self.saturation = saturation
+        self.max_depth = max_depth
+        self.max_places = max_places
+        self.queue = deque([{
+            'lat': latitude,
+            'lng': longitude,
+            'zoom': base_zoom(population or 0),
+            'depth': 0
+        }])
+        self.stats = []
+        self.added = 0
+
+    def __iter__(self):
+        while self.queue:
+            if self.max_places and self.added >= self.max_places:
+                return
+            yield self.queue.popleft()
+
+    def record(self, tile, found, new, added=0):
+        saturated = found >= self.saturation
+        self.added += added
+        self.stats.append({
+            'lat': tile['lat'],
+            'lng': tile['lng'],
+            'zoom': tile['zoom'],
+            'found': found,
+            'new': new,
+            'added': added,
+            'saturated': saturated
+        })
+        if saturated and tile['depth'] < self.max_depth:
+            self.queue.extend(self.subdivide(tile))
+
+    @staticmethod
+    def subdivide(tile):
+        lat_span, lng_span = tile_span(tile['lat'], tile['zoom'])
+        children = []
+        for lat_sign in (-1, 1):
+            for lng_sign in (-1, 1):
+                children.append({
+                    'lat': tile['lat'] + lat_sign * lat_span / 4,
+                    'lng': tile['lng'] + lng_sign * lng_span / 4,
+                    'zoom': tile['zoom'] + 1,
+                    'depth': tile['depth'] + 1
+                })
+        return children
+
+    def format(self):
+        lines = []
+        for tile in self.stats:
+            marker = ' (capped, split)' if tile['saturated'] else ''
+            lines.append(f"@{tile['lat']:.4f},{tile['lng']:.4f},{tile['zoom']}z: "
+                         f"{tile['found']} found, {tile['new']} new, {tile['added']} added{marker}")
+        searches = len(self.stats)
+        total_new = sum(tile['new'] for tile in self.stats)
+        lines.append(f"{searches} tile searches, {total_new / searches if searches else 0:.1f} new places per search")
+        return '\n'.join(lines)
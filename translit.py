@@ -0,0 +1,103 @@
+import re
+import unicodedata
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h', 'і': 'i', 'ї': 'yi', 'є': 'ye',
+    'ґ': 'g', 'ә': 'a', 'ө': 'o', 'ү': 'u', 'ң': 'n', 'ұ': 'u', 'һ': 'h'
+}
+
+# Spelling variants that collapse to one consonant (kh/h/x, q/k, w/v, dzh/zh/j, ...)
+SKELETON_REPLACEMENTS = [('dzh', 'j'), ('zh', 'j'), ('kh', 'h'), ('x', 'h'), ('q', 'k'), ('c', 'k'),
+                         ('w', 'v'), ('ph', 'f'), ('dj', 'j')]
+VOWELS_RE = re.compile(r'[aeiouy]')
+NON_LETTERS_RE = re.compile(r'[^a-z]')
+
+def transliterate(text):
+    """Lowercase Latin rendering of Cyrillic or accented text"""
+    text = ''.join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in text.lower())
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+def name_skeleton(text):
+    """Consonant skeleton of a place name, so Tashkent, Toshkent and Ташкент compare equal"""
+    text = NON_LETTERS_RE.sub('', transliterate(text))
+    for old, new in SKELETON_REPLACEMENTS:
+        text = text.replace(old, new)
+    text = VOWELS_RE.sub('', text)
+    return re.sub(r'(.)\1+', r'\1', text)
+
+# Returned by a place-page extractor instead of a record when the page puts the
+# place in another city, so the caller does not fall back to the search card
+OUT_OF_TOWN = 'out of town'
+
+def city_matches(city, address):
+    """Whether an address mentions the city, in any script or common romanization
+
+    >>> city_matches('Tashkent', 'Ташкент, улица Навои, 12')
+    True
+    >>> city_matches('Toshkent', 'Tashkent, Navoi street 12')
+    True
+    >>> city_matches('Andijan', 'Андижан, ул. Навои')
+    True
+    >>> city_matches('Samarkand', 'Samarqand, Registon ko‘chasi')
+    True
+    >>> city_matches('Bukhara', 'Бухара, улица Накшбанди')
+    True
+    >>> city_matches('Fergana', "Farg'ona, Mustaqillik ko'chasi")
+    True
+    >>> city_matches('Tashkent', 'Самарканд, улица Навои, 12')
+    False
+    """
+    if not city or not address:
+        return True
+    if city.lower() in address.lower():
+        return True
+    
+    city_latin = transliterate(city)
+    address_latin = transliterate(address)
+    if city_latin in address_latin:
+        return True
+    
+    city_skeleton = name_skeleton(city)
+    if len(city_skeleton) < 3:
+        return False
+    # Compare against runs of consecutive address words, as long as the city name
+    words = [word for word in re.split(r'[\s,.;/()-]+', address) if word]
+    size = len(city.split())
+    for start in range(len(words) - size + 1):
+        if name_skeleton(' '.join(words[start:start + size])) == city_skeleton:
+            return True
+    return False
+
+def city_skeletons(names):
+    """Skeletons of the given city names, for names_other_city()"""
+    skeletons = (name_skeleton(name) for name in names if name)
+    return frozenset(skeleton for skeleton in skeletons if len(skeleton) >= 3)
+
+def names_other_city(city, address, skeletons):
+    """Whether an address clearly lies outside `city`: none of its comma-separated parts
+    is `city`, and one is another city from `skeletons`. Addresses that name no city
+    at all, as most in-city snippets do, are not outside. Parts are compared whole,
+    so a region named after the city ("Ташкентская область") does not count as it.
+
+    >>> cities = city_skeletons(['Tashkent', 'Samarkand', 'Navoiy', 'Chirchiq'])
+    >>> names_other_city('Tashkent', 'улица Навои, 12', cities)
+    False
+    >>> names_other_city('Tashkent', 'Самарканд, улица Навои, 12', cities)
+    True
+    >>> names_other_city('Tashkent', 'Ташкентская область, Чирчик, улица Амира Темура, 5', cities)
+    True
+    >>> names_other_city('Tashkent', 'Ташкент, Юнусабадский район', cities)
+    False
+    """
+    if not address:
+        return False
+    own = name_skeleton(city)
+    parts = {name_skeleton(part) for part in address.split(',')}
+    if own in parts:
+        return False
+    return any(part in skeletons for part in parts)
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from place_key import canonical_place_key, BUSINESS_KEY_FIELDS
+from config import VISITED_INDEX_PATH, SQLITE_JOURNAL_MODE
+
+COMMIT_EVERY = 200
+
+# Visits are kept per dataset: the output files of a first run and of every run that
+# continued from them.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (file TEXT PRIMARY KEY, dataset TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS dataset_places (
+    dataset TEXT NOT NULL, place_key TEXT NOT NULL, visited_at REAL NOT NULL,
+    PRIMARY KEY (dataset, place_key)
+);
+CREATE TABLE IF NOT EXISTS dataset_businesses (
+    dataset TEXT NOT NULL, business_key TEXT NOT NULL, visited_at REAL NOT NULL,
+    PRIMARY KEY (dataset, business_key)
+);
+"""
+
+def _file_stem(path):
+    # CSV and JSON outputs of one run share a stem
+    return os.path.splitext(os.path.basename(path))[0]
+
+def keys_from_frame(df):
+    """Place keys and business keys of a results table, without a per-row loop.
+    Expects the frame read with dtype=str, so phone numbers keep their digits."""
+    def column(name):
+        if name not in df:
+            return pd.Series('', index=df.index)
+        return df[name].fillna('').astype(str).str.strip()
+
+    business_keys = column(BUSINESS_KEY_FIELDS[0])
+    for field in BUSINESS_KEY_FIELDS[1:]:
+        business_keys = business_keys + '|' + column(field)
+
+    place_keys = column('place_key')
+    missing = (place_keys == '') & (column('link') != '')
+    if missing.any():
+        place_keys = place_keys.copy()
+        place_keys[missing] = df.loc[missing, 'link'].map(canonical_place_key)
+    return set(place_keys[place_keys != '']), set(business_keys)
+
+class VisitedIndex:
+    """Place keys and business keys visited by earlier runs of a dataset, with when
+    they were visited, so a resumed crawl can skip known places before navigating to
+    them. Runs of unrelated datasets never hide places from each other."""
+
+    def __init__(self, path=VISITED_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.dataset = None
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        self.db.executescript(SCHEMA)
+
+    def open_dataset(self, output_file, continued_from=None):
+        """Record visits under the dataset of `continued_from` (a results file of an
+        earlier run), or start a new dataset named after `output_file`"""
+        with self._lock:
+            dataset = None
+            if continued_from:
+                row = self.db.execute("SELECT dataset FROM datasets WHERE file = ?", (_file_stem(continued_from),)).fetchone()
+                dataset = row[0] if row else _file_stem(continued_from)
+                self.db.execute("INSERT OR IGNORE INTO datasets VALUES (?, ?)", (_file_stem(continued_from), dataset))
+            self.dataset = dataset or _file_stem(output_file)
+            self.db.execute("INSERT OR REPLACE INTO datasets VALUES (?, ?)", (_file_stem(output_file), self.dataset))
+            self.db.commit()
+        return self.dataset
+
+    def load(self):
+        """(place keys, business keys) recorded for the open dataset so far"""
+        with self._lock:
+            places = {row[0] for row in self.db.execute(
+                "SELECT place_key FROM dataset_places WHERE dataset = ?", (self.dataset,))}
+            businesses = {row[0] for row in self.db.execute(
+                "SELECT business_key FROM dataset_businesses WHERE dataset = ?", (self.dataset,))}
+        return places, businesses
+
+    def add_many(self, place_keys=(), business_keys=()):
+        now = time.time()
+        with self._lock:
+            self.db.executemany("INSERT OR IGNORE INTO dataset_places VALUES (?, ?, ?)",
+                                ((self.dataset, key, now) for key in place_keys))
+            self.db.executemany("INSERT OR IGNORE INTO dataset_businesses VALUES (?, ?, ?)",
+                                ((self.dataset, key, now) for key in business_keys))
+            self.db.commit()
+            self._pending = 0
+
+    def mark(self, place_key=None, business_key=None):
+        """Record one visit; commits are batched"""
+        now = time.time()
+        with self._lock:
+            if place_key:
+                self.db.execute("INSERT OR REPLACE INTO dataset_places VALUES (?, ?, ?)", (self.dataset, place_key, now))
+            if business_key:
+                self.db.execute("INSERT OR REPLACE INTO dataset_businesses VALUES (?, ?, ?)", (self.dataset, business_key, now))
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self.db.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self.db.commit()
+            self.db.close()
@@ -0,0 +1,93 @@
+import threading
+from config import WAIT_TIMEOUTS
+
+# Readiness predicates per page type. Each is a JS expression over `args`,
+# the extra arguments passed to wait_until_ready().
+READY_PREDICATES = {
+    'google_search': "document.querySelector('div[role=\"feed\"]') || document.querySelector('h1.DUwDvf')",
+    'google_scroll': "args[0].scrollHeight > args[1]",
+    'google_place': "(function(h) { return h && h.innerText.trim(); })(document.querySelector('h1.DUwDvf'))",
+    'yandex_search': "document.querySelector('a[href*=\"/org/\"]') || document.querySelector('[class*=\"search-list-view\"]')",
+    'yandex_scroll': "document.querySelectorAll('a[href*=\"/org/\"]').length > args[0]",
+    'yandex_place': "document.querySelector('h1.orgpage-header-view__header, h1[class*=\"title\"], div[class*=\"card-title-view\"] h1')",
+    'yandex_contacts': "document.querySelector('div[class*=\"business-card-address\"], a[class*=\"address\"], a[href^=\"tel:\"], div[class*=\"business-contacts-phone\"]')"
+}
+
+# Resolves as soon as the predicate holds, re-checking on every DOM mutation
+WAIT_SCRIPT = """
+var args = arguments[0];
+var timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var start = performance.now();
+var check = function() {
+    try { return !!(%s); } catch (e) { return false; }
+};
+if (check()) {
+    done({ready: true, elapsed: 0});
+    return;
+}
+var finished = false;
+var observer = new MutationObserver(function() {
+    if (check()) finish(true);
+});
+var timer = setTimeout(function() { finish(check()); }, timeoutMs);
+function finish(ready) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done({ready: ready, elapsed: performance.now() - start});
+}
+observer.observe(document.documentElement || document, {childList: true, subtree: true, attributes: true, characterData: true});
+"""
+
+class WaitStats:
+    """How long each readiness wait actually took, per stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, elapsed, ready):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            entry['count'] += 1
+            entry['total'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            if not ready:
+                entry['timeouts'] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {
+                    'count': entry['count'],
+                    'avg': entry['total'] / entry['count'],
+                    'max': entry['max'],
+                    'timeouts': entry['timeouts']
+                }
+                for stage, entry in self.stages.items()
+            }
+
+    def format(self):
+        lines = []
+        for stage, entry in sorted(self.summary().items()):
+            lines.append(f"{stage}: {entry['count']} waits, avg {entry['avg']:.2f}s, max {entry['max']:.2f}s, {entry['timeouts']} timeouts")
+        return '\n'.join(lines)
+
+wait_stats = WaitStats()
+
+def wait_until_ready(driver, stage, args=None, timeout=None):
+    """Block until the stage's readiness predicate holds or its timeout expires.
+    Returns True if the page became ready."""
+    if timeout is None:
+        timeout = WAIT_TIMEOUTS[stage]
+    script = WAIT_SCRIPT % READY_PREDICATES[stage]
+    try:
+        result = driver.execute_async_script(script, args or [], int(timeout * 1000))
+        ready = bool(result and result.get('ready'))
+        elapsed = (result or {}).get('elapsed', timeout * 1000) / 1000
+    except Exception:
+        ready, elapsed = False, timeout
+    wait_stats.record(stage, elapsed, ready)
+    return ready
@@ -0,0 +1,280 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from config import WORK_QUEUE_PATH, WORK_LEASE_SECONDS, WORK_HEARTBEAT_SECONDS, WORK_MAX_ATTEMPTS, WORK_MAX_BLOCKS, SQLITE_JOURNAL_MODE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    service TEXT NOT NULL,
+    city TEXT NOT NULL,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    priority REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    blocks INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    updated_at REAL,
+    UNIQUE (run_id, service, city, query)
+);
+CREATE INDEX IF NOT EXISTS units_by_status ON units (run_id, status, id);
+CREATE TABLE IF NOT EXISTS results (
+    unit_id INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_unit ON results (unit_id);
+CREATE TABLE IF NOT EXISTS yields (
+    service TEXT NOT NULL,
+    country_code TEXT NOT NULL,
+    city TEXT NOT NULL,
+    query TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    new INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    pages INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS yields_by_city ON yields (service, country_code, city, query);
+"""
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    """City x query x service work units in SQLite, handed out under expiring leases.
+    Any process that can open the file can pull from it; a unit whose worker stops
+    heartbeating goes back to the queue once its lease runs out."""
+
+    def __init__(self, path=WORK_QUEUE_PATH, lease_seconds=WORK_LEASE_SECONDS, max_attempts=WORK_MAX_ATTEMPTS,
+                 max_blocks=WORK_MAX_BLOCKS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_blocks = max_blocks
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        self.db.executescript(SCHEMA)
+
+    def _write(self, work):
+        """Run `work(db)` inside one write transaction"""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.db)
+                self.db.execute("COMMIT")
+                return result
+            except:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def create_run(self, config, units):
+        """Store a run's settings and its (service, city, query) units, in crawl order"""
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S_") + f"{os.getpid()}"
+        now = time.time()
+        def work(db):
+            db.execute("INSERT INTO runs VALUES (?, ?, ?)", (run_id, json.dumps(config), now))
+            db.executemany(
+                "INSERT OR IGNORE INTO units (run_id, service, city, query, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, service, city, query, now) for service, city, query in units]
+            )
+        self._write(work)
+        return run_id
+
+    def get_run(self, run_id=None):
+        """Settings of `run_id`, or of the newest run. Returns (run_id, config)"""
+        with self._lock:
+            if run_id:
+                row = self.db.execute("SELECT run_id, config FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            else:
+                row = self.db.execute("SELECT run_id, config FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    def lease(self, run_id, worker, service=None, prefer=None):
+        """Claim the next pending unit (of `service`, if given), or one whose lease
+        expired. Units of the `prefer` service come first, so a worker keeps its open
+        browsers until that service runs dry. None when nothing is left"""
+        now = time.time()
+        service_filter = " AND service = ?" if service else ""
+        service_args = (service,) if service else ()
+        def work(db):
+            # Units that keep killing their workers stop being handed out
+            db.execute(
+                "UPDATE units SET status = 'failed', error = 'lease expired', updated_at = ? "
+                "WHERE run_id = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, run_id, now, self.max_attempts)
+            )
+            row = db.execute(
+                "SELECT id, service, city, query, attempts FROM units "
+                "WHERE run_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_until < ?))" + service_filter +
+                " ORDER BY service = ? DESC, priority DESC, id LIMIT 1",
+                (run_id, now) + service_args + (prefer,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE units SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row[0])
+            )
+            return {'id': row[0], 'service': row[1], 'city': row[2], 'query': row[3], 'attempt': row[4] + 1}
+        return self._write(work)
+
+    def heartbeat(self, unit_id, worker):
+        """Extend a lease. False when the unit has been reclaimed by someone else"""
+        now = time.time()
+        with self._lock:
+            cursor = self.db.execute(
+                "UPDATE units SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, unit_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, unit_id, worker, records):
+        """Store a unit's records and mark it done, atomically. False if the lease was lost"""
+        now = time.time()
+        def work(db):
+            owned = db.execute(
+                "SELECT 1 FROM units WHERE id = ? AND worker = ? AND status = 'leased'", (unit_id, worker)
+            ).fetchone()
+            if not owned:
+                return False
+            db.execute("DELETE FROM results WHERE unit_id = ?", (unit_id,))
+            db.executemany(
+                "INSERT INTO results VALUES (?, ?)",
+                [(unit_id, json.dumps(record, ensure_ascii=False, default=str)) for record in records]
+            )
+            db.execute("UPDATE units SET status = 'done', error = NULL, updated_at = ? WHERE id = ?", (now, unit_id))
+            return True
+        return self._write(work)
+
+    def fail(self, unit_id, worker, error):
+        """Give a unit back for retry, or mark it failed once it is out of attempts"""
+        with self._lock:
+            self.db.execute(
+                "UPDATE units SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "blocks = 0, error = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, str(error)[:500], time.time(), unit_id, worker)
+            )
+
+    def release(self, unit_id, worker):
+        """Hand a unit back untouched (interrupted), without spending an attempt"""
+        with self._lock:
+            self.db.execute(
+                "UPDATE units SET status = 'pending', attempts = attempts - 1, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), unit_id, worker)
+            )
+
+    def block(self, unit_id, worker, outcome):
+        """Hand back a unit that hit a block page without spending an attempt, or mark
+        it failed once it has been blocked `max_blocks` times in a row.
+        Returns True if the unit went back to the queue."""
+        with self._lock:
+            self.db.execute(
+                "UPDATE units SET blocks = blocks + 1, attempts = attempts - 1, "
+                "status = CASE WHEN blocks + 1 < ? THEN 'pending' ELSE 'failed' END, "
+                "error = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_blocks, f"{outcome} page", time.time(), unit_id, worker)
+            )
+            row = self.db.execute("SELECT status FROM units WHERE id = ?", (unit_id,)).fetchone()
+        return bool(row) and row[0] == 'pending'
+
+    def open_units(self, run_id):
+        """Units not yet leased or done: pending ones and ones the scheduler skipped"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT id, service, city, query, status FROM units WHERE run_id = ? AND status IN ('pending', 'skipped')",
+                (run_id,)
+            ).fetchall()
+        return [{'id': row[0], 'service': row[1], 'city': row[2], 'query': row[3], 'status': row[4]} for row in rows]
+
+    def set_plan(self, plan):
+        """Apply (unit id, priority, status) triples from the scheduler to open units"""
+        def work(db):
+            db.executemany(
+                "UPDATE units SET priority = ?, status = ? WHERE id = ? AND status IN ('pending', 'skipped')",
+                [(priority, status, unit_id) for unit_id, priority, status in plan]
+            )
+        self._write(work)
+
+    def record_yield(self, run_id, service, country_code, city, query, found, new, added, pages, seconds):
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO yields VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (service, country_code, city, query, found, new, added, pages, seconds, run_id, time.time())
+            )
+
+    def yield_history(self, country_code, exclude_run=None):
+        """Yields recorded by earlier runs in a country, oldest first"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT service, city, query, found, new, added, pages, seconds FROM yields "
+                "WHERE country_code = ? AND run_id != ? ORDER BY recorded_at",
+                (country_code, exclude_run or '')
+            ).fetchall()
+        keys = ('service', 'city', 'query', 'found', 'new', 'added', 'pages', 'seconds')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def counts(self, run_id):
+        with self._lock:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM units WHERE run_id = ? GROUP BY status", (run_id,)).fetchall()
+        return dict(rows)
+
+    def results(self, run_id):
+        """Every stored record of the run, in unit order"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT record FROM results JOIN units ON units.id = results.unit_id "
+                "WHERE units.run_id = ? AND units.status = 'done' ORDER BY units.id",
+                (run_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+class Heartbeat:
+    """Keeps a unit's lease alive from a background thread while it is being worked on"""
+
+    def __init__(self, queue, unit_id, worker, interval=WORK_HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.unit_id = unit_id
+        self.worker = worker
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.unit_id, self.worker):
+                    self.lost = True
+                    return
+            except sqlite3.Error:
+                pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,90 @@
+"""Queue worker: pulls units of a queued run and scrapes them, alongside main.py or
+on its own. Start as many as the machine allows; workers on other hosts need the
+queue file on a network share and SQLITE_JOURNAL_MODE = 'DELETE'.
+
+    python worker.py                   # newest run in work_queue.db
+    python worker.py --run RUN_ID      # a specific run
+    python worker.py --service Yandex  # only one service's units
+    python worker.py --export          # save the run's results once the queue is drained
+"""
+import argparse
+import threading
+from colorama import Fore, Style, init
+from geo_data import GeoDataManager
+from main import work_through, scraper_classes, group_by_phone
+from scheduler import CityScheduler
+from result_sink import ResultSink
+from work_queue import WorkQueue, worker_name
+from metrics import start_metrics, save_metrics
+from place_key import canonical_place_key, business_key
+from config import WORK_QUEUE_PATH
+
+init(autoreset=True)
+
+def load_run(queue, run_id, config):
+    """Run state seeded with what the run's finished units already collected"""
+    run = {
+        'all_data': [],
+        'seen_businesses': set(),
+        'seen_places': set(),
+        'country_name': config['country_name'],
+        'output_format': config['output_format'],
+        'first_query': config['search_queries'][0],
+        'lock': threading.Lock()
+    }
+    for record in queue.results(run_id):
+        run['seen_businesses'].add(business_key(record))
+        if record.get('place_key') or record.get('link'):
+            run['seen_places'].add(record.get('place_key') or canonical_place_key(record['link']))
+    return run
+
+def export(queue, run_id, config):
+    sink = ResultSink(config['output_format'], config['country_name'], config['search_queries'][0])
+    seen_businesses = set()
+    for record in queue.results(run_id):
+        unique_key = business_key(record)
+        if unique_key not in seen_businesses:
+            seen_businesses.add(unique_key)
+            sink.write(record)
+    sink.finalize(regroup=group_by_phone if config['map_service'] == 3 else None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape units from the work queue")
+    parser.add_argument('--queue', default=WORK_QUEUE_PATH, help="Queue database file")
+    parser.add_argument('--run', help="Run id (default: newest run)")
+    parser.add_argument('--service', choices=['Google', 'Yandex'], help="Only take this service's units")
+    parser.add_argument('--export', action='store_true', help="Save the run's results when no units are left")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue)
+    run_id, config = queue.get_run(args.run)
+    if run_id is None:
+        print(f"{Fore.RED}No queued run found in {args.queue}{Style.RESET_ALL}")
+        return
+
+    print(f"{Fore.CYAN}Working on run {run_id}: {queue.counts(run_id)}{Style.RESET_ALL}")
+    run = load_run(queue, run_id, config)
+    # One stats file per worker; the first worker on a host gets the endpoint
+    metrics_path = f"metrics_{worker_name().replace(':', '_')}.json"
+    start_metrics(path=metrics_path)
+    try:
+        geo = GeoDataManager()
+        # The budget belongs to the run's main process, but its low-yield skips hold
+        # here too, or this worker's replans would put those units back
+        scheduler = CityScheduler(queue, run_id, config['country_code'], geo.get_city_locations(config['country_code']),
+                                  skip_low_yield=config.get('skip_low_yield', False))
+        work_through(queue, run_id, run, scraper_classes(), geo, config['country_code'], service=args.service, scheduler=scheduler)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}Interrupted, unit returned to the queue{Style.RESET_ALL}")
+        return
+    finally:
+        save_metrics(metrics_path)
+
+    counts = queue.counts(run_id)
+    print(f"{Fore.GREEN}✓ Nothing left to lease: {counts}{Style.RESET_ALL}")
+    if args.export and not counts.get('pending') and not counts.get('leased'):
+        export(queue, run_id, config)
+    queue.close()
+
+if __name__ == "__main__":
+    main()
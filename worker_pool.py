@@ -0,0 +1,169 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from rate_control import PageBlocked
+from config import WORKER_COUNT, WORKER_BACKEND
+
+# Scraper owned by the current worker process (process backend only)
+_process_scraper = None
+
+def _init_process_worker(scraper_class, headless):
+    global _process_scraper
+    from multiprocessing.util import Finalize
+    _process_scraper = scraper_class(headless=headless)
+    # Pool workers exit without running atexit hooks, finalizers still run
+    Finalize(_process_scraper, _process_scraper.close, exitpriority=10)
+
+def _extract_in_process(link, kwargs):
+    return _process_scraper.extract_place_data(link, **kwargs)
+
+class PlaceWorkerPool:
+    """Fan place-detail extraction out to independent browser workers"""
+
+    def __init__(self, scraper_class, workers=WORKER_COUNT, backend=WORKER_BACKEND, headless=True):
+        if backend not in ('thread', 'process'):
+            raise ValueError(f"Unknown worker backend: {backend}")
+        self.scraper_class = scraper_class
+        self.workers = max(1, workers)
+        self.backend = backend
+        self.headless = headless
+        self.crashes = 0
+        self._local = threading.local()
+        self._scrapers = []
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._executor = self._create_executor()
+
+    def _create_executor(self):
+        if self.backend == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_process_worker,
+                initargs=(self.scraper_class, self.headless)
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='place-worker')
+
+    def _thread_scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self.scraper_class(headless=self.headless)
+            self._local.scraper = scraper
+            with self._lock:
+                self._scrapers.append(scraper)
+        return scraper
+
+    def _discard_thread_scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+        self._local.scraper = None
+        if scraper is None:
+            return
+        with self._lock:
+            if scraper in self._scrapers:
+                self._scrapers.remove(scraper)
+        try:
+            scraper.close()
+        except:
+            pass
+
+    def _extract_in_thread(self, link, kwargs):
+        # One retry on a fresh browser if this worker's browser died
+        for attempt in range(2):
+            try:
+                return self._thread_scraper().extract_place_data(link, **kwargs)
+            except PageBlocked:
+                # Not a crash: the scraper already rotated its browser, the caller requeues
+                raise
+            except Exception as e:
+                with self._lock:
+                    self.crashes += 1
+                print(f"Worker crashed on {link}: {e}")
+                self._discard_thread_scraper()
+        return None
+
+    def _submit(self, link, kwargs):
+        if self.backend == 'process':
+            future = self._executor.submit(_extract_in_process, link, kwargs)
+        else:
+            future = self._executor.submit(self._extract_in_thread, link, kwargs)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _shutdown(self, wait):
+        # Executor.shutdown(cancel_futures=True) needs Python 3.9; cancel queued tasks by hand
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def extract_many(self, links, **kwargs):
+        """Yield (link, place_data) pairs in completion order.
+        `links` may be a generator, it is only advanced as workers free up."""
+        source = iter(links)
+        pending = deque()
+        retried = set()
+        running = {}
+        
+        while True:
+            # Keep a bounded number of tasks in flight so a broken pool loses little work
+            while len(running) < self.workers * 2:
+                if not pending:
+                    link = next(source, None)
+                    if link is None:
+                        break
+                    pending.append(link)
+                link = pending.popleft()
+                running[self._submit(link, kwargs)] = link
+            if not running:
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                link = running.pop(future)
+                try:
+                    yield link, future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    self.crashes += 1
+                    if link not in retried:
+                        retried.add(link)
+                        pending.appendleft(link)
+                    else:
+                        yield link, None
+                except PageBlocked:
+                    raise
+                except Exception as e:
+                    self.crashes += 1
+                    print(f"Worker error on {link}: {e}")
+                    yield link, None
+            
+            if broken:
+                # A worker process died, every in-flight task is lost with the pool
+                print("Worker process crashed, restarting pool...")
+                for future, link in running.items():
+                    if link not in retried:
+                        retried.add(link)
+                        pending.appendleft(link)
+                    else:
+                        yield link, None
+                running.clear()
+                self._shutdown(wait=False)
+                self._executor = self._create_executor()
+
+    def close(self):
+        self._shutdown(wait=True)
+        with self._lock:
+            scrapers, self._scrapers = self._scrapers, []
+        for scraper in scrapers:
+            try:
+                scraper.close()
+            except:
+                pass
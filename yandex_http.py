@@ -0,0 +1,224 @@
+import html
+import itertools
+import json
+import re
+import threading
+from urllib.parse import urlsplit
+from yandex_scraper import YandexMapsScraper, other_city_skeletons
+from http_client import create_session
+from driver_manager import DriverManager, LazyDriverMixin
+from page_store import PageStore
+from place_key import canonical_place_key
+from translit import OUT_OF_TOWN, city_matches, names_other_city
+from extraction import SOCIAL_DOMAINS
+from rate_control import rate_controller, classify_response, BLOCK_OUTCOMES, PageBlocked
+from metrics import metrics
+from config import YANDEX_BASE_URL, YANDEX_HTTP_CONCURRENCY, HTTP_TIMEOUT, PAGE_CAPTURE_MODE
+
+STATE_VIEW_RE = re.compile(r'<script[^>]*class="state-view"[^>]*>(.*?)</script>', re.S)
+SEARCH_PAGE_SIZE = 25
+
+# Shared by every scraper in the process, so pool workers stay within one bound
+_request_slots = threading.BoundedSemaphore(YANDEX_HTTP_CONCURRENCY)
+
+def extract_state_view(page):
+    """Decode the state-view JSON the Maps web app boots from"""
+    match = STATE_VIEW_RE.search(page)
+    if not match:
+        return None
+    text = match.group(1).strip()
+    if text.startswith('&quot;') or text.startswith('{&quot;'):
+        text = html.unescape(text)
+    return json.loads(text)
+
+def _is_org_item(node):
+    return (
+        isinstance(node, dict) and isinstance(node.get('title'), str)
+        and node.get('id') is not None
+        and (node.get('type') == 'business' or 'fullAddress' in node or 'ratingData' in node)
+    )
+
+def find_org_items(node, depth=0):
+    """Walk a decoded state or API response and yield every organization in order"""
+    if depth > 40:
+        return
+    if _is_org_item(node):
+        yield node
+        return
+    if isinstance(node, dict):
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return
+    for child in children:
+        yield from find_org_items(child, depth + 1)
+
+def _pick_website(urls):
+    urls = [url for url in urls if url and 'yandex' not in url.lower()]
+    for url in urls:
+        if not any(social in url.lower() for social in SOCIAL_DOMAINS):
+            return url
+    return urls[0] if urls else None
+
+def parse_org_item(item, base_url=YANDEX_BASE_URL):
+    rating = item.get('ratingData') or {}
+    rating_value = rating.get('ratingValue')
+    reviews = rating.get('reviewCount') or rating.get('ratingCount')
+    categories = [c.get('name') for c in item.get('categories') or [] if isinstance(c, dict) and c.get('name')]
+    phones = [
+        p.get('number') or p.get('value') for p in item.get('phones') or []
+        if isinstance(p, dict) and (p.get('number') or p.get('value'))
+    ]
+    urls = [u if isinstance(u, str) else (u or {}).get('value') for u in item.get('urls') or []]
+    urls += [(link or {}).get('href') for link in item.get('socialLinks') or [] if isinstance(link, dict)]
+
+    link = f"{base_url}/maps/org/{item.get('seoname') or 'org'}/{item['id']}/"
+    return {
+        'title': item['title'],
+        'rating': str(rating_value) if rating_value is not None else None,
+        'reviews': str(reviews) if reviews is not None else None,
+        'category': categories[0] if categories else None,
+        'address': item.get('fullAddress') or item.get('address'),
+        'website': _pick_website(urls),
+        'phone': phones[0] if phones else None,
+        'link': link,
+        'place_key': canonical_place_key(link)
+    }
+
+def find_org(state, place_key):
+    """The organization for `place_key` in an org page's state, which also lists
+    related and nearby organizations"""
+    for item in find_org_items(state):
+        if place_key == f"yandex:{item['id']}":
+            return item
+    return None
+
+class YandexMapsHttpScraper(LazyDriverMixin, YandexMapsScraper):
+    """Reads organizations from the state the Maps web app embeds in its pages and
+    from its search API, over plain HTTP. A browser is started lazily, only when a
+    response cannot be parsed."""
+
+    def __init__(self, headless=True, base_url=YANDEX_BASE_URL):
+        self.base_url = base_url.rstrip('/')
+        self.session = create_session(language='ru-RU,ru;q=0.9,en;q=0.8')
+        self.page_store = PageStore() if PAGE_CAPTURE_MODE else None
+        self.rate = rate_controller('Yandex')
+        self.http_hits = 0
+        self.fallbacks = 0
+        self.driver_manager = DriverManager(lambda: self._setup_driver(headless))
+
+    def _local_url(self, url):
+        # Recorded links may point at yandex.ru; keep requests on the configured host
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        return f"{self.base_url}{path}"
+
+    def _fetch(self, url, params=None):
+        with _request_slots, self.rate.slot(), metrics.timer('fetch_seconds', service='Yandex'):
+            response = self.session.get(url, params=params, timeout=HTTP_TIMEOUT)
+        outcome = classify_response(response.status_code, response.text, response.url)
+        self.rate.record(outcome)
+        if outcome in BLOCK_OUTCOMES:
+            raise PageBlocked(outcome, url)
+        response.raise_for_status()
+        return response
+
+    def _next_pages(self, state, text, skip, status):
+        """Further result pages from the search API, until it runs dry or refuses
+        (which leaves status['complete'] False)"""
+        config = state.get('config') or {}
+        params = {
+            'text': text,
+            'lang': 'ru_RU',
+            'results': SEARCH_PAGE_SIZE,
+            'csrfToken': config.get('csrfToken'),
+            'sessionId': config.get('counters', {}).get('analytics', {}).get('sessionId') or config.get('sessionId')
+        }
+        while True:
+            try:
+                params['skip'] = skip
+                items = list(find_org_items(self._fetch(f"{self.base_url}/maps/api/search", params).json()))
+            except PageBlocked:
+                raise
+            except Exception as e:
+                print(f"Yandex search API stopped at {skip} results: {e}")
+                status['complete'] = False
+                return
+            if not items:
+                return
+            yield items
+            skip += len(items)
+
+    def _iter_search_cards(self, query, city, country, seen_places, limit, status):
+        text = f"{query} {city}"
+
+        try:
+            state = extract_state_view(self._fetch(f"{self.base_url}/maps/", {'text': text}).text)
+            first_page = list(find_org_items(state))
+        except PageBlocked:
+            raise
+        except Exception as e:
+            print(f"HTTP search failed, using browser: {e}")
+            first_page = None
+
+        if not first_page:
+            self.fallbacks += 1
+            yield from super()._iter_search_cards(query, city, country, seen_places, limit, status)
+            return
+
+        self.http_hits += 1
+        pages = [first_page]
+        if len(first_page) >= SEARCH_PAGE_SIZE:
+            pages = itertools.chain(pages, self._next_pages(state, text, len(first_page), status))
+
+        emitted = set()
+        other_cities = other_city_skeletons(country)
+        skipped = 0
+        for items in pages:
+            for item in items:
+                card = parse_org_item(item, self.base_url)
+                if card['place_key'] in emitted:
+                    continue
+                emitted.add(card['place_key'])
+                if names_other_city(city, card.get('address'), other_cities):
+                    skipped += 1
+                    continue
+                yield card
+                if limit and len(emitted) - skipped >= limit:
+                    break
+            if limit and len(emitted) - skipped >= limit:
+                break
+
+        # Ran dry or hit the limit, unless the search API refused a page
+        status.setdefault('complete', True)
+        if skipped:
+            print(f"Skipped {skipped} results outside {city}")
+
+    def extract_place_data(self, url, city=None, country=None):
+        try:
+            page = self._fetch(self._local_url(url)).text
+            if self.page_store:
+                self.page_store.put(canonical_place_key(url), url, page, source='Yandex', city=city, country=country)
+                if PAGE_CAPTURE_MODE == 'store_only':
+                    return None
+            item = find_org(extract_state_view(page), canonical_place_key(url))
+            if item:
+                data = parse_org_item(item, self.base_url)
+                self.http_hits += 1
+                if city and data['address'] and not city_matches(city, data['address']):
+                    return OUT_OF_TOWN
+                data['link'] = url
+                data['place_key'] = canonical_place_key(url)
+                return data
+        except PageBlocked:
+            raise
+        except Exception as e:
+            print(f"HTTP extraction failed, using browser: {e}")
+
+        self.fallbacks += 1
+        return super().extract_place_data(url, city, country)
+
+    def close(self):
+        self.session.close()
+        self.driver_manager.close()
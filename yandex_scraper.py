@@ -1,22 +1,52 @@
 import time
+from urllib.parse import quote_plus
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
-from config import IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, SCROLL_PAUSE_TIME, MAX_SCROLL_ATTEMPTS, MAX_PLACES_PER_CITY, CHROME_BINARY_PATH, EXTRACT_WAIT_TIME
+from extraction import YANDEX_FIELDS, YANDEX_PARSERS, YANDEX_SNIPPET_SCRIPT, extract_fields, parse_fields
+from config import IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, SCROLL_PAUSE_TIME, MAX_SCROLL_ATTEMPTS, MAX_PLACES_PER_CITY, CHROME_BINARY_PATH, WAIT_TIMEOUTS, PAGE_CAPTURE_MODE, SCROLL_STALE_STEPS
+from waits import wait_until_ready
+from page_store import PageStore
+from place_key import canonical_place_key
+from translit import OUT_OF_TOWN, city_matches, city_skeletons, names_other_city
+from geo_data import GeoDataManager
+from driver_manager import DriverManager
+from driver_provisioning import get_chromedriver
+from search_cache import search_key, cached_search
+from rate_control import rate_controller, check_page, PageBlocked
+from metrics import metrics, count_missing_fields
+from resource_blocking import configure_blocking_options, apply_resource_blocking, collect_network_stats
 import os
-import subprocess
-import requests
-import zipfile
-import stat
-import shutil
+
+SCROLL_CONTAINER_SCRIPT = "return document.querySelector('div[class*=\"scroll__container\"], div[class*=\"scroll\"]');"
+SCROLL_SCRIPT = """
+if (arguments[0]) {
+    arguments[0].scrollTop = arguments[0].scrollHeight;
+} else {
+    window.scrollTo(0, document.body.scrollHeight);
+}
+"""
+
+_city_skeletons = {}
+
+def other_city_skeletons(country):
+    """Skeletons of all city names in `country`, for telling out-of-town snippets apart"""
+    if country not in _city_skeletons:
+        geo = GeoDataManager()
+        code = geo.get_country_code(country) if country else None
+        _city_skeletons[country] = city_skeletons(geo.get_city_names(code)) if code else frozenset()
+    return _city_skeletons[country]
 
 class YandexMapsScraper:
     def __init__(self, headless=True):
-        self.driver = self._setup_driver(headless)
+        self.driver_manager = DriverManager(lambda: self._setup_driver(headless))
+        self.driver = self.driver_manager.acquire()
+        self.page_store = PageStore() if PAGE_CAPTURE_MODE else None
+        self.rate = rate_controller('Yandex')
     
     def _setup_driver(self, headless):
         options = ChromeOptions()
+        options.page_load_strategy = 'eager'
         if headless:
             options.add_argument('--headless=new')
         options.add_argument('--no-sandbox')
@@ -29,291 +59,185 @@ class YandexMapsScraper:
         
         if CHROME_BINARY_PATH and os.path.exists(CHROME_BINARY_PATH):
             options.binary_location = CHROME_BINARY_PATH
+        configure_blocking_options(options)
         
-        driver_path = self._get_chromedriver()
-        service = ChromeService(driver_path)
-        driver = webdriver.Chrome(service=service, options=options)
+        driver_path = get_chromedriver()
+        if driver_path:
+            driver = webdriver.Chrome(service=ChromeService(driver_path), options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
         driver.implicitly_wait(IMPLICIT_WAIT)
         driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(max(WAIT_TIMEOUTS.values()) + 5)
+        apply_resource_blocking(driver)
         return driver
     
-    def _get_chromedriver(self):
-        import platform
-        
-        is_windows = platform.system() == 'Windows'
-        driver_dir = os.path.expanduser('~/.chromedriver')
-        driver_name = 'chromedriver.exe' if is_windows else 'chromedriver'
-        driver_path = os.path.join(driver_dir, driver_name)
-        
-        if os.path.exists(driver_path):
-            return driver_path
-        
-        if is_windows:
-            chrome_paths = [
-                'C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe',
-                'C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe',
-                os.path.expanduser('~\\AppData\\Local\\Google\\Chrome\\Application\\chrome.exe')
-            ]
-            chrome_path = next((p for p in chrome_paths if os.path.exists(p)), chrome_paths[0])
-        else:
-            chrome_path = CHROME_BINARY_PATH or '/usr/bin/google-chrome'
-        
-        result = subprocess.run([chrome_path, '--version'], capture_output=True, text=True)
-        chrome_version = result.stdout.strip().split()[-1].split('.')[0]
-        
-        os.makedirs(driver_dir, exist_ok=True)
-        
-        versions_url = f'https://googlechromelabs.github.io/chrome-for-testing/latest-versions-per-milestone-with-downloads.json'
-        response = requests.get(versions_url)
-        data = response.json()
-        version = data['milestones'][chrome_version]['version']
-        
-        if is_windows:
-            url = f'https://storage.googleapis.com/chrome-for-testing-public/{version}/win64/chromedriver-win64.zip'
-            folder_name = 'chromedriver-win64'
-        else:
-            url = f'https://storage.googleapis.com/chrome-for-testing-public/{version}/linux64/chromedriver-linux64.zip'
-            folder_name = 'chromedriver-linux64'
-        
-        zip_path = os.path.join(driver_dir, 'chromedriver.zip')
-        response = requests.get(url, stream=True)
-        with open(zip_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(driver_dir)
-        
-        extracted_driver = os.path.join(driver_dir, folder_name, driver_name)
-        shutil.move(extracted_driver, driver_path)
-        if not is_windows:
-            os.chmod(driver_path, stat.S_IRWXU)
-        os.remove(zip_path)
-        shutil.rmtree(os.path.join(driver_dir, folder_name), ignore_errors=True)
-        
-        return driver_path
-    
     def search_places(self, query, city, country):
+        return [card['link'] for card in self.search_cards(query, city, country)]
+    
+    def search_cards(self, query, city, country):
+        """Search and return result snippets located in `city`, as partial place records"""
+        return list(self.iter_cards(query, city, country))
+    
+    def iter_cards(self, query, city, country, seen_places=None, limit=MAX_PLACES_PER_CITY):
+        """Yield snippets located in `city` as the result list scrolls, or straight from
+        the search cache when this search ran recently. Stops once the list stops
+        growing, at `limit` results, or after SCROLL_STALE_STEPS steps that only
+        surfaced place keys already in `seen_places`."""
+        key = search_key('Yandex', query, city, country)
+        return cached_search(key, limit, lambda status: self._iter_search_cards(query, city, country, seen_places, limit, status))
+    
+    def _iter_search_cards(self, query, city, country, seen_places, limit, status):
         search_query = f"{query} {city}"
-        url = f"https://yandex.ru/maps/?text={search_query.replace(' ', '+')}"
+        url = f"https://yandex.ru/maps/?text={quote_plus(search_query)}"
         
         try:
-            self.driver.get(url)
-            time.sleep(2)
-            self._scroll_results()
-            return self._extract_place_links()
+            with self.rate.slot(), metrics.timer('page_load_seconds', service='Yandex', page='search'):
+                self.driver.get(url)
+                wait_until_ready(self.driver, 'yandex_search')
         except Exception as e:
-            return []
-    
-    def _scroll_results(self):
+            return
+        check_page(self, 'a[href*="/org/"], h1')
         try:
-            scrollable = self.driver.find_elements(By.CSS_SELECTOR, 'div[class*="scroll"]')
-            if scrollable:
-                for _ in range(MAX_SCROLL_ATTEMPTS):
-                    self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable[0])
-                    time.sleep(SCROLL_PAUSE_TIME)
-            else:
-                for _ in range(MAX_SCROLL_ATTEMPTS):
-                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(SCROLL_PAUSE_TIME)
+            container = self.driver.execute_script(SCROLL_CONTAINER_SCRIPT)
         except Exception as e:
-            pass
+            return
+        
+        emitted = set()
+        other_cities = other_city_skeletons(country)
+        read = 0
+        kept = 0
+        skipped = 0
+        no_growth = 0
+        stale_steps = 0
+        complete = False
+        # Running estimate of how long the list takes to grow after a scroll
+        latency = SCROLL_PAUSE_TIME
+        for step in range(MAX_SCROLL_ATTEMPTS + 1):
+            read, cards = self._read_place_cards(read)
+            fresh = 0
+            for card in cards:
+                if card['place_key'] in emitted:
+                    continue
+                emitted.add(card['place_key'])
+                # Only snippets that name another city are dropped; most in-city
+                # addresses leave the city out, their place page decides
+                if names_other_city(city, card.get('address'), other_cities):
+                    skipped += 1
+                    # Out-of-town results are not repeats, the feed is still moving
+                    fresh += 1
+                    continue
+                if seen_places is None or card['place_key'] not in seen_places:
+                    fresh += 1
+                kept += 1
+                yield card
+                if limit and kept >= limit:
+                    break
+            
+            if limit and kept >= limit:
+                complete = True
+                break
+            stale_steps = 0 if fresh else stale_steps + 1
+            if no_growth >= 3 or step == MAX_SCROLL_ATTEMPTS:
+                complete = True
+                break
+            # Cut short on repeats: the rest of the list is unseen, so it is not cached
+            if stale_steps >= SCROLL_STALE_STEPS:
+                break
+            
+            try:
+                with metrics.timer('scroll_step_seconds', service='Yandex'):
+                    self.driver.execute_script(SCROLL_SCRIPT, container)
+                    started = time.perf_counter()
+                    timeout = min(max(3 * latency, 0.3), WAIT_TIMEOUTS['yandex_scroll'])
+                    grew = wait_until_ready(self.driver, 'yandex_scroll', [read], timeout=timeout)
+            except Exception as e:
+                break
+            
+            if grew:
+                latency = 0.7 * latency + 0.3 * (time.perf_counter() - started)
+                no_growth = 0
+            else:
+                no_growth += 1
+        
+        status['complete'] = complete
+        if skipped:
+            print(f"Skipped {skipped} results outside {city}")
+        collect_network_stats(self.driver)
     
     def _extract_place_links(self):
-        links = []
+        return [card['link'] for card in self._extract_place_cards()]
+    
+    def _extract_place_cards(self):
+        return self._read_place_cards()[1]
+    
+    def _read_place_cards(self, start=0):
+        """Parse result snippets from anchor `start` on. Returns (anchors seen, cards)"""
+        cards = {}
+        count = start
         try:
-            selectors = [
-                'a[href*="/org/"]',
-                'a[href*="maps.yandex"]',
-                'div[class*="search-snippet"] a'
-            ]
-            
-            for selector in selectors:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                for element in elements:
-                    href = element.get_attribute('href')
-                    if href and ('/org/' in href or 'yandex' in href) and href not in links:
-                        if '?' in href:
-                            href = href.split('?')[0]
-                        links.append(href)
-            
-            if MAX_PLACES_PER_CITY:
-                return links[:MAX_PLACES_PER_CITY]
-            return links
+            result = self.driver.execute_script(YANDEX_SNIPPET_SCRIPT, start) or {}
+            count = result.get('count', start)
+            for raw in result.get('cards', []):
+                href = raw.get('link')
+                if not href or '/org/' not in href:
+                    continue
+                href = href.split('?')[0]
+                key = canonical_place_key(href)
+                if key not in cards:
+                    cards[key] = {
+                        'title': raw.get('title'),
+                        'category': raw.get('category'),
+                        'address': raw.get('address'),
+                        'link': href,
+                        'place_key': key
+                    }
         except Exception as e:
-            return []
+            pass
+        return count, list(cards.values())
     
     def extract_place_data(self, url, city=None, country=None):
         try:
-            self.driver.get(url)
-            time.sleep(1)
+            with metrics.timer('place_seconds', service='Yandex'):
+                data = self._extract_place_data(url, city, country)
+            metrics.count('places', service='Yandex', result='out_of_town' if data == OUT_OF_TOWN else 'ok' if data else 'empty')
+            return data
+        finally:
+            self.driver = self.driver_manager.page_done()
+    
+    def _extract_place_data(self, url, city, country):
+        try:
+            with self.rate.slot(), metrics.timer('page_load_seconds', service='Yandex', page='place'):
+                self.driver.get(url)
+                wait_until_ready(self.driver, 'yandex_place')
+            check_page(self, 'h1')
             
             # Scroll to load all content
             self.driver.execute_script("window.scrollTo(0, 500);")
-            time.sleep(0.5)
-            
-            address = self._safe_extract(self._get_address)
+            wait_until_ready(self.driver, 'yandex_contacts')
             
-            # Filter by city - skip if address doesn't contain the city name
-            if city and address:
-                city_lower = city.lower()
-                address_lower = address.lower()
-                if city_lower not in address_lower:
+            if self.page_store:
+                self.page_store.put(canonical_place_key(url), url, self.driver.page_source, source='Yandex', city=city, country=country)
+                if PAGE_CAPTURE_MODE == 'store_only':
                     return None
             
-            data = {
-                'title': self._safe_extract(self._get_title),
-                'rating': self._safe_extract(self._get_rating),
-                'reviews': self._safe_extract(self._get_reviews),
-                'category': self._safe_extract(self._get_category),
-                'address': address,
-                'website': self._safe_extract(self._get_website),
-                'phone': self._safe_extract(self._get_phone),
-                'link': url
-            }
+            with metrics.timer('extract_fields_seconds', service='Yandex'):
+                data = parse_fields(extract_fields(self.driver, YANDEX_FIELDS), YANDEX_PARSERS)
+            count_missing_fields('Yandex', data)
+            collect_network_stats(self.driver)
+            address = data.get('address')
+            
+            # Filter by city - skip if address doesn't mention the city in any script
+            if city and address and not city_matches(city, address):
+                return OUT_OF_TOWN
+            
+            data['link'] = url
+            data['place_key'] = canonical_place_key(url)
             return data
+        except PageBlocked:
+            raise
         except Exception as e:
             return None
     
-    def _safe_extract(self, func):
-        try:
-            return func()
-        except:
-            return None
-    
-    def _get_title(self):
-        selectors = [
-            'h1.orgpage-header-view__header',
-            'h1[class*="title"]',
-            'div[class*="card-title-view"] h1',
-            'span[class*="card-title"]'
-        ]
-        for selector in selectors:
-            try:
-                elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-                text = elem.text.strip()
-                if text:
-                    return text
-            except:
-                continue
-        return None
-    
-    def _get_rating(self):
-        selectors = ['span[class*="rating-badge"]', 'div[class*="rating"]']
-        for selector in selectors:
-            try:
-                elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-                text = elem.text
-                if text and any(c.isdigit() for c in text):
-                    return text.split()[0]
-            except:
-                continue
-        return None
-    
-    def _get_reviews(self):
-        selectors = ['span[class*="reviews"]', 'a[class*="reviews"]']
-        for selector in selectors:
-            try:
-                elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-                text = elem.text
-                if text and any(c.isdigit() for c in text):
-                    return ''.join(filter(str.isdigit, text))
-            except:
-                continue
-        return None
-    
-    def _get_category(self):
-        selectors = ['div[class*="rubric"]', 'span[class*="category"]']
-        for selector in selectors:
-            try:
-                return self.driver.find_element(By.CSS_SELECTOR, selector).text
-            except:
-                continue
-        return None
-    
-    def _get_address(self):
-        selectors = [
-            'div[class*="business-card-address"]',
-            'a[class*="address"]',
-            'div[class*="address"] span',
-            'span[itemprop="address"]',
-            'div[class*="contacts"] div[class*="address"]'
-        ]
-        for selector in selectors:
-            try:
-                elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-                text = elem.text.strip()
-                if text and len(text) > 10:
-                    return text
-            except:
-                continue
-        return None
-    
-    def _get_website(self):
-        # Look for actual website links, not social media
-        try:
-            # Find all links in business card
-            links = self.driver.find_elements(By.CSS_SELECTOR, 'a[href^="http"]')
-            for link in links:
-                href = link.get_attribute('href')
-                if not href:
-                    continue
-                
-                # Skip Yandex internal links
-                if 'yandex' in href.lower():
-                    continue
-                
-                # Skip social media - prioritize real websites
-                if any(social in href.lower() for social in ['instagram', 'facebook', 'vk.com', 'twitter', 'telegram']):
-                    continue
-                
-                # This is likely a real website
-                return href
-            
-            # If no real website found, return social media as fallback
-            for link in links:
-                href = link.get_attribute('href')
-                if href and 'yandex' not in href.lower() and 'http' in href:
-                    return href
-        except:
-            pass
-        return None
-    
-    def _get_phone(self):
-        # Try tel: links first
-        try:
-            tel_links = self.driver.find_elements(By.CSS_SELECTOR, 'a[href^="tel:"]')
-            for link in tel_links:
-                phone = link.get_attribute('href').replace('tel:', '').strip()
-                if phone:
-                    return phone
-        except:
-            pass
-        
-        # Try phone containers
-        selectors = [
-            'div[class*="business-contacts-phone"]',
-            'div[class*="phone"] span',
-            'span[class*="phone"]',
-            'div[itemprop="telephone"]'
-        ]
-        
-        for selector in selectors:
-            try:
-                elems = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                for elem in elems:
-                    text = elem.text.strip()
-                    # Clean up - remove button text like "Telefonu göster"
-                    if text and ('+' in text or any(c.isdigit() for c in text)):
-                        # Remove common button texts
-                        text = text.replace('Telefonu göster', '').replace('Show phone', '').replace('Показать телефон', '').strip()
-                        # Only return if it still has digits
-                        if any(c.isdigit() for c in text):
-                            return text
-            except:
-                continue
-        return None
-    
     def close(self):
-        if self.driver:
-            self.driver.quit()
+        self.driver_manager.close()